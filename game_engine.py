@@ -0,0 +1,159 @@
+from game_grid import GameGrid  # the class for modeling the game grid
+from piece_queue import PieceQueue  # used for creating the tetrominoes
+
+
+# A class for running the rules of the game without drawing anything, so that
+# a game can be simulated (headless) or played through a front end that only
+# handles the user input and the display (see Tetris_2048.py)
+class GameEngine:
+    # the actions that can be applied to the active tetromino by using step
+    actions = ("left", "right", "down", "drop", "rotate")
+    # the largest number of time steps run by a single update (the rest of the
+    # elapsed time is dropped, e.g., after the game window has been frozen)
+    max_ticks_per_update = 5
+
+    # A constructor for creating a game on a game grid with the given dimensions
+    # (game_speed is the duration of a time step in ms, see update), in which
+    # the tetrominoes are generated by using the given seed and randomizer (see
+    # piece_queue.py), so a game can be reproduced from its seed
+    def __init__(self, grid_h, grid_w, game_speed=0, seed=None, randomizer=None):
+        self.game_speed = game_speed
+        # the time elapsed since the last time step in seconds (see update)
+        self.gravity_time = 0.0
+        # the game_over flag shows whether the game is over or not
+        self.game_over = False
+        # the events of the last time step for animating the changes on the
+        # game grid (see GameGrid.settle)
+        self.events = []
+        # the queue of the tetrominoes that enter the game grid
+        self.pieces = PieceQueue(grid_h, grid_w, seed, randomizer)
+        # create the game grid with the first and the next tetrominoes
+        self.grid = GameGrid(grid_h, grid_w, game_speed)
+        self.grid.current_tetromino = self.pieces.next()
+        self.grid.next_tetromino = self.pieces.next()
+
+    # A method for restarting the game on an empty game grid (the next
+    # tetromino of the previous game becomes the first one of the new game)
+    def restart(self):
+        next_tetromino = self.grid.next_tetromino
+        self.grid = GameGrid(self.grid.grid_height, self.grid.grid_width,
+                             self.game_speed)
+        self.game_over = False
+        self.gravity_time = 0.0
+        self.events = []
+        self.grid.current_tetromino = next_tetromino
+        self.grid.next_tetromino = self.pieces.next()
+
+    # A method for applying an action of the player to the active tetromino
+    # (returns True when the action changes the game state and False otherwise)
+    def step(self, action):
+        tetromino = self.grid.current_tetromino
+        if self.game_over or tetromino is None:
+            return False
+        if action == "left" or action == "right" or action == "down":
+            return tetromino.move(action, self.grid)
+        elif action == "drop":
+            tetromino.hard_fall(self.grid)
+            return True
+        elif action == "rotate":
+            return tetromino.rotate(self.grid)
+        raise ValueError("unknown action: " + str(action))
+
+    # A method for advancing the game by one time step: the active tetromino
+    # falls down by one, or it is locked onto the game grid when it cannot go
+    # down anymore and then the full lines and the merges on the game grid are
+    # resolved in the same time step (see GameGrid.settle)
+    # (returns True when the active tetromino has moved down and False otherwise)
+    def tick(self):
+        self.events = []
+        if self.game_over:
+            return False
+        tetromino = self.grid.current_tetromino
+        # move the active tetromino down by one (auto fall)
+        success = tetromino.move("down", self.grid)
+        # lock the active tetromino onto the grid when it cannot go down anymore
+        if not success:
+            # update the game grid by locking the tiles of the landed tetromino
+            self.game_over = self.grid.lock_tetromino(tetromino)
+            if self.game_over:
+                return False
+            # clear any full lines and merge the tiles until nothing changes
+            self.events = self.grid.settle()
+            # the next tetromino becomes the active tetromino
+            self.grid.current_tetromino = self.grid.next_tetromino
+            self.grid.next_tetromino = self.pieces.next()
+        return success
+
+    # A method that returns the list of the next count tetrominoes that will
+    # enter the game grid (the first one is the next tetromino of the grid)
+    def preview(self, count):
+        if count <= 0:
+            return []
+        return [self.grid.next_tetromino] + self.pieces.preview(count - 1)
+
+    # A method for advancing the game by the given elapsed time in seconds: the
+    # active tetromino falls down by one (see tick) each time game_speed ms have
+    # passed, independently of how often the game grid is displayed
+    # (returns the number of the time steps run)
+    def update(self, elapsed):
+        # a time step is run on each update when the game speed is not set
+        if self.game_speed <= 0:
+            self.tick()
+            return 1
+        step_time = self.game_speed / 1000
+        self.gravity_time += elapsed
+        events, ticks = [], 0
+        while self.gravity_time >= step_time and not self.game_over:
+            self.gravity_time -= step_time
+            self.tick()
+            events.extend(self.events)
+            ticks += 1
+            # drop the rest of the elapsed time when it is too long
+            if ticks == GameEngine.max_ticks_per_update:
+                self.gravity_time = 0.0
+                break
+        # the events of all the time steps run by this update
+        self.events = events
+        return ticks
+
+
+# A function for checking that a copied game (by copy.deepcopy or pickle)
+# continues exactly as the original game does (e.g., for searching the
+# placements of a tetromino or replaying a game from a saved state)
+def _regressionTest():
+    import copy
+    import pickle
+    engine = GameEngine(20, 12, seed=2048)
+    for i in range(200):
+        engine.step(GameEngine.actions[i % len(GameEngine.actions)])
+        engine.tick()
+    copies = [copy.deepcopy(engine), pickle.loads(pickle.dumps(engine))]
+    for i in range(2000):
+        action = GameEngine.actions[(i * 7) % len(GameEngine.actions)]
+        for game in [engine] + copies:
+            game.step(action)
+            game.tick()
+            if game.game_over:
+                game.restart()
+        for game in copies:
+            assert (game.grid.tile_matrix == engine.grid.tile_matrix).all(), i
+            assert game.grid.score == engine.grid.score, i
+    print("copied games replay the original game for", i + 1, "steps")
+    # games with different grid dimensions run side by side without changing
+    # each other (the tetrominoes enter each game on the top row of its grid)
+    games = [GameEngine(20, 12, seed=1), GameEngine(40, 30, seed=1)]
+    for i in range(300):
+        for game in games:
+            game.step("drop")
+            game.tick()
+            if game.game_over:
+                game.restart()
+            grid = game.grid
+            for tetromino in (grid.current_tetromino, grid.next_tetromino):
+                assert tetromino.bottom_left_cell.y < grid.grid_height, i
+            assert game.pieces.grid_height == grid.grid_height
+    print("games with different grid dimensions run side by side")
+
+
+if __name__ == '__main__':
+    _regressionTest()
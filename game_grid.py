@@ -1,9 +1,8 @@
-import lib.stddraw as stddraw  # used for displaying the game grid
 from lib.color import Color  # used for coloring the game grid
 from point import Point  # used for tile positions
 import numpy as np  # fundamental Python module for scientific computing
-import copy as cp
-from tile import Tile
+from tile import Tile  # used for drawing the tiles on the game grid
+from merge_engine import resolve_merges  # used for merging the tiles
 
 
 # A class for modeling the game grid
@@ -14,8 +13,24 @@ class GameGrid:
         self.grid_height = grid_h
         self.grid_width = grid_w
         self.info_width = 5
-        # create a tile matrix to store the tiles locked on the game grid
-        self.tile_matrix = np.full((grid_h, grid_w), None)
+        # create a tile matrix to store the tiles locked on the game grid (each
+        # cell stores the exponent of the number on its tile, 0 if it is empty)
+        self.tile_matrix = np.zeros((grid_h, grid_w), dtype=np.uint8)
+        # the occupancy of each row of the game grid as a bit mask (bit col of
+        # row_bits[row] is set when the cell at (row, col) is occupied)
+        self.row_bits = [0] * grid_h
+        # the height of each column (the skyline): the number of rows from the
+        # bottom of the game grid to the topmost tile in the column
+        self.column_heights = np.zeros(grid_w, dtype=int)
+        # the landing rows of the tetrominoes dropped onto the skyline, cached
+        # by (rotation state, column), and of the tetrominoes below the skyline,
+        # cached by (rotation state, column, row), until the tiles on the game
+        # grid change
+        self.landing_rows_cache = {}
+        # the columns in which tiles may merge or fall, set when the tiles on
+        # the game grid change (a merged or fallen tile also affects the tiles
+        # in the neighbouring columns)
+        self.dirty_columns = np.zeros(grid_w, dtype=bool)
         # create the tetromino that is currently being moved on the game grid
         self.current_tetromino = None
 
@@ -27,6 +42,9 @@ class GameGrid:
         # set the colors used for the grid lines and the grid boundaries
         self.line_color = Color(170, 155, 144)
         self.boundary_color = Color(170, 155, 144)
+        # set the colors used for the info panel and the texts on it
+        self.info_color = Color(167, 160, 151)
+        self.text_color = Color(255, 255, 255)
         # thickness values used for the grid lines and the grid boundaries
         self.line_thickness = 0.004
         self.box_thickness = 3 * self.line_thickness
@@ -40,34 +58,219 @@ class GameGrid:
 
         self.restart_flag = 0
 
-    # A method for displaying the game grid
-    def display(self):
-        # clear the background to empty_cell_color
-        stddraw.clear(self.empty_cell_color)
-        # draw the game grid
-        self.draw_grid()
-        self.score = Tile.merge_tiles(self.tile_matrix, self.score)
+        # the static parts of the display drawn once as offscreen layers below
+        # and above the tiles, and the canvas generation they are drawn for
+        # (see stddraw.canvasGeneration)
+        self.background_layer = None
+        self.foreground_layer = None
+        self.layers_generation = None
+        # the background layer with the locked tiles drawn on it, and the tile
+        # matrix whose tiles are drawn on it
+        self.board_layer = None
+        self.board_matrix = np.zeros_like(self.tile_matrix)
+        # what was shown on each cell of the game grid by the last display (see
+        # get_cells), the score and the next tetromino that were shown, so that
+        # only the changed regions of the display are drawn again
+        self.drawn_cells = None
+        self.drawn_score = None
+        self.drawn_next = None
+        # the arrays and the point reused by each display, so that displaying
+        # the game grid does not create new objects in each frame: the cells to
+        # show (swapped with drawn_cells), the changed cells, rows and columns,
+        # and the position of the ghost of the current tetromino
+        self.cells = None
+        self.changed_cells = np.zeros((grid_h, grid_w), dtype=bool)
+        self.changed_rows = np.zeros(grid_h, dtype=bool)
+        self.changed_cols = np.zeros(grid_w, dtype=bool)
+        self.ghost_cell = Point()
+        # the batch of the drawing of the current tetromino over its ghost
+        # (see stddraw.beginBatch) and the state it is recorded for, so that
+        # the tetromino is drawn again in each changed region of the display
+        # and in each frame without converting its coordinates again
+        self.tetromino_batch = None
+        self.tetromino_batch_state = None
 
-        # draw the current/active tetromino if it is not None
-        # (the case when the game grid is updated)
+    # A method for displaying the game grid and then waiting for the given
+    # pause duration in ms (see the main loop in Tetris_2048.py)
+    def display(self, pause=0):
+        # stddraw is imported when drawing so that the game rules can run
+        # without pygame (see game_engine.py)
+        import lib.stddraw as stddraw
+        # draw the static layers again when the canvas size or scale changes
+        if self.layers_generation != stddraw.canvasGeneration():
+            self.draw_layers()
+            self.board_layer = None
+            self.drawn_cells = None
+        # draw the locked tiles that have changed on the board layer
+        self.update_board_layer()
+        # the position of the ghost of the current/active tetromino
+        ghost_position = None
         if self.current_tetromino is not None:
-            self.current_tetromino.draw()
-        # draw a box around the game grid
-        self.draw_info()
+            ghost_position = self.ghost_position(self.current_tetromino,
+                                                 self.ghost_cell)
+        cells = self.get_cells(ghost_position, self.cells)
+        if self.drawn_cells is None:
+            # draw the empty grid cells, the grid lines, the info panel and the
+            # tiles locked on the game grid
+            stddraw.picture(self.board_layer)
+            # draw the current/active tetromino if it is not None
+            # (the case when the game grid is updated) over its ghost
+            self.draw_tetromino(ghost_position)
+            # draw the score and the next tetromino on the info panel
+            self.draw_info()
+            # draw the boxes around the game grid and the info panel
+            stddraw.picture(self.foreground_layer)
+        else:
+            # draw only the regions of the display that have changed
+            self.draw_changes(cells, ghost_position)
+        # the array of the cells shown before is reused by the next display
+        self.cells, self.drawn_cells = self.drawn_cells, cells
+        self.drawn_score = self.score
+        self.drawn_next = self.next_tetromino
+        # check if the restart button is clicked
+        self.check_restart()
+        # show the resulting drawing and wait for the given pause duration
+        stddraw.show(pause)
+
+    # A method that returns what is shown on each cell of the game grid as an
+    # array of numbers: the exponent of the locked tile (see tile_matrix) plus
+    # 16 times the exponent of the tile of the ghost plus 256 times the
+    # exponent of the tile of the current tetromino on the cell (stored in the
+    # given array when it is not None)
+    def get_cells(self, ghost_position, cells=None):
+        if cells is None:
+            cells = np.empty(self.tile_matrix.shape, dtype=np.uint16)
+        np.copyto(cells, self.tile_matrix)
+        tetromino = self.current_tetromino
+        if tetromino is not None:
+            for position, shift in ((ghost_position, 4),
+                                    (tetromino.bottom_left_cell, 8)):
+                for (dx, dy), exponent in zip(tetromino.orientation.offsets,
+                                              tetromino.tile_exponents):
+                    col, row = position.x + dx, position.y + dy
+                    if 0 <= row < self.grid_height:
+                        cells[row, col] += exponent << shift
+        return cells
+
+    # A method for drawing again only the regions of the display that have
+    # changed since the last display, each restricted to its rectangle
+    def draw_changes(self, cells, ghost_position):
+        import lib.stddraw as stddraw  # used for drawing the game grid
+        # the margin around the changed cells in which the ghost of the current
+        # tetromino drawn on a changed cell may have been drawn
+        margin = 0.25
+        # the changed cells are grouped into the runs of consecutive rows with
+        # changed cells, so that the active tetromino and its ghost are usually
+        # drawn again in two small regions
+        changed = np.not_equal(cells, self.drawn_cells, out=self.changed_cells)
+        if np.count_nonzero(changed):
+            changed_rows = changed.any(axis=1, out=self.changed_rows)
+            row_min = None
+            for row in range(self.grid_height + 1):
+                if row < self.grid_height and changed_rows[row]:
+                    if row_min is None:
+                        row_min = row
+                    continue
+                if row_min is None:
+                    continue
+                # the columns of the changed cells in the rows of the group
+                changed_cols = changed[row_min:row].any(axis=0,
+                                                        out=self.changed_cols)
+                col_min = int(changed_cols.argmax())
+                col_max = self.grid_width - 1 - int(changed_cols[::-1].argmax())
+                stddraw.setClip(col_min - 0.5 - margin, row_min - 0.5 - margin,
+                                col_max - col_min + 1 + 2 * margin,
+                                row - row_min + 2 * margin)
+                stddraw.picture(self.board_layer)
+                self.draw_tetromino(ghost_position)
+                stddraw.picture(self.foreground_layer)
+                row_min = None
+        # the parts of the info panel above and below the Restart button
+        panel_x = self.grid_width - 0.5
+        button_y = self.grid_height / 2 + 1
+        if self.score != self.drawn_score:
+            stddraw.setClip(panel_x, button_y + 1, self.info_width,
+                            self.grid_height - 1.5 - button_y)
+            stddraw.picture(self.background_layer)
+            self.draw_score()
+            stddraw.picture(self.foreground_layer)
+        if self.next_tetromino is not self.drawn_next:
+            stddraw.setClip(panel_x, -0.5, self.info_width, button_y + 0.5)
+            stddraw.picture(self.background_layer)
+            self.draw_next_tetromino()
+            stddraw.picture(self.foreground_layer)
+        stddraw.setClip()  # remove the restriction of the drawing region
+
+    # A method for drawing the parts of the display that do not change during
+    # the game once as two layers covering the canvas: the background layer
+    # with the empty grid cells, the grid lines and the info panel, and the
+    # transparent foreground layer with the boundaries drawn over the tiles
+    def draw_layers(self):
+        import lib.stddraw as stddraw  # used for drawing the game grid
+        stddraw.beginLayer()
+        # clear the background to empty_cell_color
+        stddraw.clear(self.empty_cell_color)
+        self.draw_grid_lines()
+        self.draw_info_panel()
+        self.background_layer = stddraw.endLayer()
+        stddraw.beginLayer(transparent=True)
         self.draw_boundaries()
-        # show the resulting drawing with a pause duration = 250 ms
-        stddraw.show(self.game_speed)
+        self.foreground_layer = stddraw.endLayer()
+        self.layers_generation = stddraw.canvasGeneration()
 
-    # A method for drawing the cells and the lines of the game grid
+    # A method for drawing the locked tiles that have changed since the last
+    # display on the board layer (all the tiles when it is not drawn yet)
+    def update_board_layer(self):
+        import lib.stddraw as stddraw  # used for drawing the game grid
+        if self.board_layer is None:
+            stddraw.beginLayer()
+            stddraw.picture(self.background_layer)
+            self.draw_grid()
+            self.board_layer = stddraw.endLayer()
+        elif np.count_nonzero(np.not_equal(self.board_matrix, self.tile_matrix,
+                                           out=self.changed_cells)):
+            # draw again only the rectangle of the game grid around the
+            # changed cells
+            rows, cols = np.nonzero(self.changed_cells)
+            stddraw.beginLayer(layer=self.board_layer)
+            stddraw.setClip(cols.min() - 0.5, rows.min() - 0.5,
+                            cols.max() - cols.min() + 1, rows.max() - rows.min() + 1)
+            stddraw.picture(self.background_layer)
+            self.draw_grid()
+            self.board_layer = stddraw.endLayer()
+        np.copyto(self.board_matrix, self.tile_matrix)
+
+    # A method for drawing the tiles locked on the game grid
     def draw_grid(self):
-        # for each cell of the game grid
-        for row in range(self.grid_height):
-            for col in range(self.grid_width):
-                # if the current grid cell is occupied by a tile
-                if self.tile_matrix[row][col] is not None:
-                    # draw this tile
-                    self.tile_matrix[row][col].draw(Point(col, row))
+        import lib.stddraw as stddraw  # used for drawing the game grid
+        # the pre-rendered tiles are copied to the canvas at once by using the
+        # exponents in the tile matrix as the indexes of the pictures
+        stddraw.pictureGrid(self.tile_matrix, Tile.get_sprites())
+
+    # A method for drawing the current/active tetromino if it is not None
+    # over its ghost at the given position
+    def draw_tetromino(self, ghost_position):
+        import lib.stddraw as stddraw
+        tetromino = self.current_tetromino
+        if tetromino is None:
+            return
+        # record the drawing again only when the tetromino, its position or
+        # rotation, its ghost or the canvas size or scale has changed
+        cell = tetromino.bottom_left_cell
+        state = (tetromino, tetromino.orientation, cell.x, cell.y,
+                 ghost_position.y, stddraw.canvasGeneration())
+        if state != self.tetromino_batch_state:
+            stddraw.beginBatch()
+            tetromino.draw(ghost_position, ghost=True,
+                           grid_height=self.grid_height)
+            tetromino.draw(grid_height=self.grid_height)
+            self.tetromino_batch = stddraw.endBatch()
+            self.tetromino_batch_state = state
+        stddraw.drawBatch(self.tetromino_batch)
 
+    # A method for drawing the inner lines of the game grid
+    def draw_grid_lines(self):
+        import lib.stddraw as stddraw  # used for drawing the game grid
         # draw the inner lines of the game grid
         stddraw.setPenColor(self.line_color)
         stddraw.setPenRadius(self.line_thickness)
@@ -82,6 +285,7 @@ class GameGrid:
 
     # A method for drawing the boundaries around the game grid
     def draw_boundaries(self):
+        import lib.stddraw as stddraw  # used for drawing the game grid
         # draw a bounding box around the game grid as a rectangle
         stddraw.setPenColor(self.boundary_color)  # using boundary_color
         # set the pen radius as box_thickness (half of this thickness is visible
@@ -102,8 +306,8 @@ class GameGrid:
         # have tiles with position.y >= grid_height
         if not self.is_inside(row, col):
             return False  # the cell is not occupied as it is outside the grid
-        # the cell is occupied by a tile if it is not None
-        return self.tile_matrix[row][col] is not None
+        # the cell is occupied by a tile if it is not 0
+        return self.tile_matrix[row][col] != 0
 
     # A method for checking whether the cell with the given row and col indexes
     # is inside the game grid or not
@@ -114,102 +318,303 @@ class GameGrid:
             return False
         return True
 
-    # A method for clearing full lines from the game grid
+    # A method for checking whether a tetromino with the given row masks can be
+    # placed with its bottom left cell at (x, y) (bit j of row_masks[i] is set
+    # when the tetromino has a tile at column x + j of row y + i). The tiles
+    # must not leave the game grid from the left, right or bottom side or
+    # overlap the tiles on the game grid, and they can be above the topmost
+    # grid row only when inside is not set.
+    def can_place(self, row_masks, x, y, inside=False):
+        row_bits, grid_h, grid_w = self.row_bits, self.grid_height, self.grid_width
+        row = y - 1
+        for mask in row_masks:
+            row += 1
+            if mask == 0:
+                continue
+            # shift the row mask to the columns of the game grid
+            if x >= 0:
+                mask <<= x
+            elif mask & ((1 << -x) - 1):
+                return False  # a tile is on the left of the game grid
+            else:
+                mask >>= -x
+            if mask >> grid_w:
+                return False  # a tile is on the right of the game grid
+            if row < 0:
+                return False  # a tile is below the game grid
+            if row >= grid_h:
+                if inside:
+                    return False  # a tile is above the game grid
+                continue
+            if mask & row_bits[row]:
+                return False  # a tile overlaps a tile on the game grid
+        return True
+
+    # A method for recomputing the occupancy bit masks of the rows of the game
+    # grid from the tile matrix
+    def update_row_bits(self):
+        packed = np.packbits(self.tile_matrix != 0, axis=1, bitorder="little")
+        self.row_bits = [int.from_bytes(row.tobytes(), "little") for row in packed]
+
+    # A method for recomputing the height of each column of the game grid from
+    # the tile matrix
+    def update_column_heights(self):
+        occupied = self.tile_matrix != 0
+        tops = self.grid_height - np.argmax(occupied[::-1], axis=0)
+        self.column_heights = np.where(occupied.any(axis=0), tops, 0)
+
+    # A method that returns the row of the bottom left cell of a tetromino in
+    # the given rotation state (see tetromino.Orientation) at column x after it
+    # is dropped onto the skyline of the game grid from above
+    def landing_row(self, orientation, x):
+        key = (orientation, x)
+        if key not in self.landing_rows_cache:
+            heights = self.column_heights
+            self.landing_rows_cache[key] = max([int(heights[x + dx]) - dy
+                                                for dx, dy in orientation.bottom_offsets])
+        return self.landing_rows_cache[key]
+
+    # A method that returns the position of the bottom left cell of the ghost
+    # of the given tetromino (where it would land by a hard drop), stored in the
+    # given point when it is not None
+    def ghost_position(self, tetromino, position=None):
+        if position is None:
+            position = Point()
+        x, y = tetromino.bottom_left_cell.x, tetromino.bottom_left_cell.y
+        position.move(x, y - self.drop_distance(tetromino.orientation, x, y))
+        return position
+
+    # A method that returns the columns x at which a tetromino in the given
+    # rotation state fits horizontally and the row of its bottom left cell
+    # after it is dropped from above at each of these columns (e.g., for
+    # enumerating the placements of a tetromino)
+    def landing_rows(self, orientation):
+        xs = np.arange(-orientation.min_col, self.grid_width - orientation.max_col)
+        ys = None
+        for dx, dy in orientation.bottom_offsets:
+            rows = self.column_heights[xs + dx] - dy
+            ys = rows if ys is None else np.maximum(ys, rows)
+        return xs, ys
+
+    # A method that returns the number of rows a tetromino in the given rotation
+    # state with its bottom left cell at (x, y) can move down
+    def drop_distance(self, orientation, x, y):
+        # the landing row is found by comparing the bottom profile of the
+        # tetromino with the skyline when the tetromino is above the skyline
+        landing_y = self.landing_row(orientation, x)
+        if y >= landing_y:
+            return y - landing_y
+        # otherwise (e.g., below an overhang) it is moved down row by row, and
+        # the landing row is cached as it is displayed again in each frame
+        key = (orientation, x, y)
+        if key not in self.landing_rows_cache:
+            landing_y = y
+            while self.can_place(orientation.bottom_masks, x, landing_y - 1):
+                landing_y -= 1
+            self.landing_rows_cache[key] = landing_y
+        return y - self.landing_rows_cache[key]
+
+    # A method for merging the tiles with the same number on the game grid
+    # (returns the list of events, see merge_engine.resolve_merges)
+    def merge_tiles(self):
+        # nothing to do when the tiles have not changed since the last merge
+        if not self.dirty_columns.any():
+            return []
+        score, events = resolve_merges(self.tile_matrix, self.dirty_columns)
+        self.score += score
+        # only the columns around the changed tiles need to be merged again
+        self.dirty_columns[:] = False
+        for event in events:
+            self.mark_dirty(event[2])
+        if events:
+            self.update_row_bits()
+            self.update_column_heights()
+            self.landing_rows_cache.clear()
+        return events
+
+    # A method for resolving the full lines and the merges and falls of the
+    # tiles on the game grid until nothing changes anymore (e.g., a merged tile
+    # merging again with the tile below it), so the result does not depend on
+    # how often the game grid is displayed. Returns the ordered list of events
+    # for animating the changes: ("clear", rows) for the rows cleared at once
+    # and the events of each merge pass (see merge_engine.resolve_merges).
+    def settle(self):
+        events = []
+        while True:
+            # clear any full lines
+            lines_cleared = self.clear_lines()
+            if lines_cleared:
+                events.append(("clear", lines_cleared))
+            elif not self.dirty_columns.any():
+                return events
+            # merge the tiles until no tile can merge or fall
+            while self.dirty_columns.any():
+                events.extend(self.merge_tiles())
+
+    # A method for marking the given column and its neighbouring columns as
+    # dirty, i.e., the tiles in these columns may merge or fall
+    def mark_dirty(self, col):
+        self.dirty_columns[max(col - 1, 0):col + 2] = True
+
+    # A method for clearing full lines from the game grid (returns the indexes
+    # of the cleared rows)
     def clear_lines(self):
-        lines_to_clear = []
-
-        # Check each row for full lines
-        for row in range(self.grid_height):
-            if all(self.tile_matrix[row]):
-                lines_to_clear.append(row)
-                # update score
-                for tile in self.tile_matrix[row]:
-                    self.score += tile.number
-
-        # Clear full lines and shift down tiles
-        for row in reversed(lines_to_clear):
-            self.clear_line(row)
-            self.shift_down_tiles(row)
-        return lines_to_clear
-
-    # A method for clearing a single line
-    def clear_line(self, row):
-        for col in range(self.grid_width):
-            self.tile_matrix[row][col] = None
-
-    # A method for shifting down tiles above the cleared line
-    def shift_down_tiles(self, cleared_row):
-        # Start from the cleared row and move upwards
-        for row in range(cleared_row, self.grid_height - 1):
-            # Shift each tile down one row
-            for col in range(self.grid_width):
-                self.tile_matrix[row][col] = self.tile_matrix[row + 1][col]
-
-        # Set the top row to contain None values
-        for col in range(self.grid_width):
-            self.tile_matrix[self.grid_height - 1][col] = None
-
-    # A method that locks the tiles of a landed tetromino on the grid checking
-    # if the game is over due to having any tile above the topmost grid row.
+        # find all the full rows at once
+        full_rows = (self.tile_matrix != 0).all(axis=1)
+        lines_to_clear = np.flatnonzero(full_rows)
+        if len(lines_to_clear) == 0:
+            return []
+        # update score by the numbers on the tiles of the full rows
+        self.score += int((1 << self.tile_matrix[full_rows].astype(np.int64)).sum())
+        # move the remaining rows down in one pass and empty the rows above
+        remaining = self.tile_matrix[~full_rows]
+        self.tile_matrix[:len(remaining)] = remaining
+        self.tile_matrix[len(remaining):] = 0
+        self.row_bits = [self.row_bits[row] for row in range(self.grid_height)
+                         if not full_rows[row]] + [0] * len(lines_to_clear)
+        # the tiles above the cleared rows have moved down in all the columns
+        self.update_column_heights()
+        self.landing_rows_cache.clear()
+        self.dirty_columns[:] = True
+        return lines_to_clear.tolist()
+
+    # A method that locks the tiles of the given landed tetromino on the grid
+    # checking if the game is over due to having any tile above the topmost
+    # grid row, by writing the exponents of its tiles directly into the tile
+    # matrix at the cells given by the offsets of its rotation state
     # (This method returns True when the game is over and False otherwise.)
-    def update_grid(self, tiles_to_lock, blc_position):
+    def lock_tetromino(self, tetromino):
         # necessary for the display method to stop displaying the tetromino
         self.current_tetromino = None
-        # lock the tiles of the current tetromino (tiles_to_lock) on the grid
-        n_rows, n_cols = len(tiles_to_lock), len(tiles_to_lock[0])
-        for col in range(n_cols):
-            for row in range(n_rows):
-                # place each tile (occupied cell) onto the game grid
-                if tiles_to_lock[row][col] is not None:
-                    # compute the position of the tile on the game grid
-                    pos = Point()
-                    pos.x = blc_position.x + col
-                    pos.y = blc_position.y + (n_rows - 1) - row
-                    if self.is_inside(pos.y, pos.x):
-                        self.tile_matrix[pos.y][pos.x] = tiles_to_lock[row][col]
-                    # the game is over if any placed tile is above the game grid
-                    else:
-                        self.game_over = True
+        self.landing_rows_cache.clear()
+        x, y = tetromino.bottom_left_cell.x, tetromino.bottom_left_cell.y
+        for (dx, dy), exponent in zip(tetromino.orientation.offsets,
+                                      tetromino.tile_exponents):
+            self.lock_tile(y + dy, x + dx, exponent)
         # return the value of the game_over flag
         return self.game_over
 
-    # draw function for score, restart button and next tetromino
+    # A method for locking a tile with the given exponent on the cell with the
+    # given row and col indexes (the game is over if the cell is above the
+    # game grid)
+    def lock_tile(self, row, col, exponent):
+        if self.is_inside(row, col):
+            self.tile_matrix[row, col] = exponent
+            self.row_bits[row] |= 1 << col
+            if row >= self.column_heights[col]:
+                self.column_heights[col] = row + 1
+            self.mark_dirty(col)
+        else:
+            self.game_over = True
+
+    # A method for drawing the score and the next tetromino on the info panel
     def draw_info(self):
+        self.draw_score()
+        self.draw_next_tetromino()
+
+    # A method for drawing the score on the info panel
+    def draw_score(self):
+        import lib.stddraw as stddraw  # used for drawing the game grid
+        info_center_x_scale = (self.grid_width + self.info_width / 2) - 0.5
+        info_score_y_scale = (self.grid_height - 2)
+        stddraw.setPenColor(self.text_color)
+        stddraw.setFontFamily("Arial")
+        stddraw.setFontSize(25)
+        stddraw.boldText(info_center_x_scale, info_score_y_scale - 0.75, str(self.score))
+
+    # A method for drawing the next tetromino on the info panel
+    def draw_next_tetromino(self):
+        if self.next_tetromino is not None:
+            # the next tetromino is drawn from its rotation state and tiles with
+            # its bottom left cell at the given position on the info panel
+            self.next_tetromino.draw(Point(self.grid_width + 1, 1.5))
+
+    # A method for checking if the Restart Game button on the info panel is
+    # clicked (sets restart_flag)
+    def check_restart(self):
+        import lib.stddraw as stddraw  # used for getting the mouse clicks
+        if stddraw.mousePressed():
+            # get the x and y coordinates of the locations of the mouse
+            mouse_x, mouse_y = stddraw.mouseX(), stddraw.mouseY()
+            # check if these coordinates are inside the restart button
+            if mouse_x >= self.grid_width + 0.5 and mouse_x <= self.grid_width + self.info_width - 1.5:
+                if mouse_y >= self.grid_height / 2 + 1 and mouse_y <= self.grid_height / 2 + 2:
+                    self.restart_flag = 1
+
+    # A method for drawing the parts of the info panel that do not change
+    # during the game: the panel, the labels and the Restart Game button
+    def draw_info_panel(self):
+        import lib.stddraw as stddraw  # used for drawing the game grid
 
         # info grid settings
-        stddraw.setPenColor(Color(167, 160, 151))
+        stddraw.setPenColor(self.info_color)
         stddraw.filledRectangle(self.grid_width - 0.5, -0.5, self.info_width, self.grid_height)
         info_center_x_scale = (self.grid_width + self.info_width / 2) - 0.5
         info_score_y_scale = (self.grid_height - 2)
 
-        # draw the score
-        stddraw.setPenColor(Color(255, 255, 255))
+        # draw the labels of the score and the next tetromino
+        stddraw.setPenColor(self.text_color)
         stddraw.setFontFamily("Arial")
         stddraw.setFontSize(25)
         stddraw.boldText(info_center_x_scale, info_score_y_scale, "Score")
-        stddraw.boldText(info_center_x_scale, info_score_y_scale - 0.75, str(self.score))
-
-        # draw the next tetromino
         stddraw.boldText(info_center_x_scale, 7, "Next")
-        if self.next_tetromino is not None:
-            next_display = cp.deepcopy(self.next_tetromino)
-            next_display.bottom_left_cell = Point()
-            next_display.bottom_left_cell.x = self.grid_width + 1
-            next_display.bottom_left_cell.y = 1.5
-            next_display.draw()
 
         # Restart Game button
         stddraw.setPenColor(self.boundary_color)
         stddraw.filledRectangle(self.grid_width + 0.5, self.grid_height / 2 + 1, self.info_width - 2, 1)
-        stddraw.setPenColor(Color(255, 255, 255))
+        stddraw.setPenColor(self.text_color)
         stddraw.setFontFamily("Arial")
         stddraw.setFontSize(20)
         stddraw.boldText(self.grid_width + 2, self.grid_height / 2 + 1.5, "Restart")
 
-        if stddraw.mousePressed():
-            # get the x and y coordinates of the locations of the mouse
-            mouse_x, mouse_y = stddraw.mouseX(), stddraw.mouseY()
-            # check if these coordinates are inside the restart button
-            if mouse_x >= self.grid_width + 0.5 and mouse_x <= self.grid_width + self.info_width - 1.5:
-                if mouse_y >= self.grid_height / 2 + 1 and mouse_y <= self.grid_height / 2 + 2:
-                    self.restart_flag = 1
+
+# A function for checking that the frames of the main loop in which no
+# tetromino is locked (the steady state of the game) allocate at most
+# frame_budget bytes of memory at a time, as measured by tracemalloc, so that
+# displaying the game does not keep the garbage collector busy
+def _allocation_test(frame_budget=2048):
+    import gc
+    import random
+    import tracemalloc
+    import lib.stddraw as stddraw
+    from game_engine import GameEngine
+    random.seed(2048)
+    # the same canvas as in Tetris_2048.py
+    grid_h, grid_w = 20, 12
+    stddraw.setCanvasSize(50 * grid_w, 40 * grid_h)
+    stddraw.setXscale(-0.5, grid_w + 4)
+    stddraw.setYscale(-0.5, grid_h - 0.5)
+    stddraw.setDirtyRegions(True)
+    engine = GameEngine(grid_h, grid_w, seed=2048)
+    collections = []
+    gc.callbacks.append(lambda phase, info: collections.append(phase))
+    peaks = []
+    for frame in range(1320):
+        if frame == 120:
+            # the first frames draw everything and fill the caches
+            tracemalloc.start()
+            del collections[:]
+        tetromino = engine.grid.current_tetromino
+        tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+        # the active tetromino falls every 20 frames and it is moved every 7
+        # frames, otherwise nothing changes
+        if frame % 20 == 0:
+            engine.tick()
+        elif frame % 7 == 0:
+            engine.step(random.choice(["left", "right", "down", "rotate"]))
+        engine.grid.display(0)
+        if engine.grid.current_tetromino is tetromino and frame >= 120:
+            peaks.append(tracemalloc.get_traced_memory()[1] - start)
+        if engine.game_over:
+            engine.restart()
+    tracemalloc.stop()
+    gc.callbacks.pop()
+    print(len(peaks), "frames without locking allocate at most", max(peaks),
+          "bytes at a time (median", sorted(peaks)[len(peaks) // 2], "bytes)")
+    print(len(collections) // 2, "garbage collections")
+    assert max(peaks) <= frame_budget, max(peaks)
+
+
+if __name__ == '__main__':
+    _allocation_test()
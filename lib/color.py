@@ -9,9 +9,13 @@ objects.
 
 class Color:
     """
-    A Color object models an RGB color.
+    A Color object models an RGB color. Color objects are immutable
+    and hashable, so equal colors can be used as the same dictionary
+    key.
     """
 
+    __slots__ = ('_r', '_g', '_b', '_hash')
+
     #-------------------------------------------------------------------
 
     def __init__(self, r=0, g=0, b=0):
@@ -19,9 +23,43 @@ class Color:
         Construct self such that it has the given red (r),
         green (g), and blue (b) components.
         """
-        self._r = r  # Red component
-        self._g = g  # Green component
-        self._b = b  # Blue component
+        object.__setattr__(self, '_r', r)  # Red component
+        object.__setattr__(self, '_g', g)  # Green component
+        object.__setattr__(self, '_b', b)  # Blue component
+        object.__setattr__(self, '_hash', hash((r, g, b)))
+
+    #-------------------------------------------------------------------
+
+    def __setattr__(self, name, value):
+        """
+        Raise an AttributeError, as self cannot be changed.
+        """
+        raise AttributeError('Color objects are immutable')
+
+    #-------------------------------------------------------------------
+
+    def __reduce__(self):
+        """
+        Return how to construct self again, so that copy and pickle
+        do not set the components (see __setattr__).
+        """
+        return (Color, (self._r, self._g, self._b))
+
+    #-------------------------------------------------------------------
+
+    def __copy__(self):
+        """
+        Return self, as self cannot be changed.
+        """
+        return self
+
+    #-------------------------------------------------------------------
+
+    def __deepcopy__(self, memo):
+        """
+        Return self, as self cannot be changed.
+        """
+        return self
 
     #-------------------------------------------------------------------
 
@@ -49,6 +87,26 @@ class Color:
 
     #-------------------------------------------------------------------
 
+    def __eq__(self, other):
+        """
+        Return True if self and other have the same components, and
+        False otherwise.
+        """
+        if not isinstance(other, Color):
+            return NotImplemented
+        return (self._r == other._r) and (self._g == other._g) and \
+            (self._b == other._b)
+
+    #-------------------------------------------------------------------
+
+    def __hash__(self):
+        """
+        Return the hash of self, which is the same for equal colors.
+        """
+        return self._hash
+
+    #-------------------------------------------------------------------
+
     def __str__(self):
         """
         Return the string equivalent of self, that is, a
@@ -104,6 +162,12 @@ def _main():
     print(c1.getRed())
     print(c1.getGreen())
     print(c1.getBlue())
+    print(c1 == Color(0, 128, 255))
+    print(len({c1, Color(0, 128, 255), WHITE}))
+    import copy
+    import pickle
+    print(copy.deepcopy(c1) is c1)
+    print(pickle.loads(pickle.dumps(c1)) == c1)
 
 if __name__ == '__main__':
     _main()
\ No newline at end of file
@@ -8,8 +8,10 @@ commonly used Color objects defined in the color module.
 """
 
 import time
+import math
 import os
 import sys
+import collections
 
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = 'hide'
 import pygame
@@ -44,6 +46,7 @@ try:
     from lib.color import BOOK_BLUE
     from lib.color import BOOK_LIGHT_BLUE
     from lib.color import BOOK_RED
+    from lib.picture import Picture
 except ModuleNotFoundError:
     from color import WHITE
     from color import BLACK
@@ -65,6 +68,7 @@ except ModuleNotFoundError:
     from color import BOOK_BLUE
     from color import BOOK_LIGHT_BLUE
     from color import BOOK_RED
+    from picture import Picture
 
 #-----------------------------------------------------------------------
 
@@ -83,6 +87,9 @@ _DEFAULT_PEN_COLOR = BLACK
 _DEFAULT_FONT_FAMILY = 'Helvetica'
 _DEFAULT_FONT_SIZE = 12
 
+# The maximum number of rendered text surfaces kept for reuse.
+_TEXT_CACHE_SIZE = 256
+
 _xmin = None
 _ymin = None
 _xmax = None
@@ -95,11 +102,65 @@ _canvasWidth = float(_DEFAULT_CANVAS_SIZE)
 _canvasHeight = float(_DEFAULT_CANVAS_SIZE)
 _penRadius = None
 _penColor = _DEFAULT_PEN_COLOR
-_keysTyped = []
+
+# The queue of the keys typed as (key, time) pairs, oldest first, where
+# time is the time.perf_counter() value at which the key was typed.
+_keysTyped = collections.deque()
+
+# The keys that are repeated while they are held down, the delay before
+# the first repeat and the interval between the repeats in seconds (see
+# setKeyRepeat), the key being repeated (None when no key is repeated)
+# and the time of its next repeat.
+_repeatedKeys = frozenset()
+_keyRepeatDelay = 0.0
+_keyRepeatInterval = 0.0
+_repeatingKey = None
+_nextRepeatTime = 0.0
+
+# The pygame colors keyed by the equivalent color.Color objects, and the
+# pygame color equivalent to the pen color (see _pygameColor).
+_pygameColors = {}
+_penPygameColor = pygame.Color(_DEFAULT_PEN_COLOR.getRed(),
+    _DEFAULT_PEN_COLOR.getGreen(), _DEFAULT_PEN_COLOR.getBlue())
+
+# The fonts keyed by (family, size, bold), and the most recently used
+# rendered text surfaces keyed by (string, family, size, bold, color).
+_fonts = {}
+_textSurfaces = collections.OrderedDict()
 
 # Has the window been created?
 _windowCreated = False
 
+# The number of times the canvas size or scale has been set (see
+# canvasGeneration), and the drawing targets saved by beginLayer.
+_canvasGeneration = 0
+_layerStack = []
+
+# The rectangles of the background canvas drawn on since the last show
+# in dirty-region mode (None when the whole canvas is always shown, see
+# setDirtyRegions), whether the whole canvas must be shown next, and the
+# rectangle that the drawing is restricted to (see setClip).
+_dirtyRects = None
+_showAll = True
+_clipRect = None
+
+# The largest number of dirty rectangles shown one by one; the whole
+# canvas is shown when more rectangles have been drawn on.
+_MAX_DIRTY_RECTS = 64
+
+# The commands recorded since beginBatch() was called (None when the
+# primitives are drawn immediately), and the kinds of the commands.
+_batch = None
+_BLIT = 0
+_BLITS = 1
+_RECT = 2
+_LINE = 3
+
+# The maps from the pixels to the pictures and the pixels of the pictures
+# last drawn by pictureGrid().
+_pictureGridMaps_ = None
+_pictureGridAtlas = None
+
 #-----------------------------------------------------------------------
 # Begin added by Alan J. Broder
 #-----------------------------------------------------------------------
@@ -121,12 +182,14 @@ _mousePos = None
 def _pygameColor(c):
     """
     Convert c, an object of type color.Color, to an equivalent object
-    of type pygame.Color.  Return the result.
+    of type pygame.Color.  Return the result. The conversion is done
+    once for each color, and the result must not be changed.
     """
-    r = c.getRed()
-    g = c.getGreen()
-    b = c.getBlue()
-    return pygame.Color(r, g, b)
+    pc = _pygameColors.get(c)
+    if pc is None:
+        pc = pygame.Color(c.getRed(), c.getGreen(), c.getBlue())
+        _pygameColors[c] = pc
+    return pc
 
 #-----------------------------------------------------------------------
 
@@ -171,6 +234,8 @@ def setCanvasSize(w=_DEFAULT_CANVAS_SIZE, h=_DEFAULT_CANVAS_SIZE):
     global _canvasWidth
     global _canvasHeight
     global _windowCreated
+    global _canvasGeneration
+    global _showAll
 
     if _windowCreated:
         raise Exception('The stddraw window already was created')
@@ -185,6 +250,8 @@ def setCanvasSize(w=_DEFAULT_CANVAS_SIZE, h=_DEFAULT_CANVAS_SIZE):
     _surface = pygame.Surface((w, h))
     _surface.fill(_pygameColor(WHITE))
     _windowCreated = True
+    _canvasGeneration += 1
+    _showAll = True
 
 def setXscale(min=_DEFAULT_XMIN, max=_DEFAULT_XMAX):
     """
@@ -193,6 +260,7 @@ def setXscale(min=_DEFAULT_XMIN, max=_DEFAULT_XMAX):
     """
     global _xmin
     global _xmax
+    global _canvasGeneration
     min = float(min)
     max = float(max)
     if min >= max:
@@ -200,6 +268,7 @@ def setXscale(min=_DEFAULT_XMIN, max=_DEFAULT_XMAX):
     size = max - min
     _xmin = min - _BORDER * size
     _xmax = max + _BORDER * size
+    _canvasGeneration += 1
 
 def setYscale(min=_DEFAULT_YMIN, max=_DEFAULT_YMAX):
     """
@@ -208,6 +277,7 @@ def setYscale(min=_DEFAULT_YMIN, max=_DEFAULT_YMAX):
     """
     global _ymin
     global _ymax
+    global _canvasGeneration
     min = float(min)
     max = float(max)
     if min >= max:
@@ -215,6 +285,7 @@ def setYscale(min=_DEFAULT_YMIN, max=_DEFAULT_YMAX):
     size = max - min
     _ymin = min - _BORDER * size
     _ymax = max + _BORDER * size
+    _canvasGeneration += 1
 
 def setPenRadius(r=_DEFAULT_PEN_RADIUS):
     """
@@ -235,7 +306,9 @@ def setPenColor(c=_DEFAULT_PEN_COLOR):
     c defaults to stddraw.BLACK.
     """
     global _penColor
+    global _penPygameColor
     _penColor = c
+    _penPygameColor = _pygameColor(c)
 
 def setFontFamily(f=_DEFAULT_FONT_FAMILY):
     """
@@ -263,18 +336,86 @@ def _makeSureWindowCreated():
 
 # Functions to draw shapes, text, and images on the background canvas.
 
+def _touched(rect):
+    """
+    Remember that rect, a pygame.Rect on the background canvas, has
+    been drawn on, so that it is shown in dirty-region mode. Drawing on
+    layers and inside a clip rectangle (which is remembered by setClip)
+    is not remembered.
+    """
+    global _showAll
+    if (_dirtyRects is not None) and (_clipRect is None) and \
+        (not _layerStack) and (not _showAll):
+        # The whole canvas is shown when it has been drawn on as a whole.
+        if (rect.width >= _canvasWidth) and (rect.height >= _canvasHeight):
+            _showAll = True
+        else:
+            _dirtyRects.append(rect)
+
+def _blit(surface, dest):
+    """
+    Draw surface on the background canvas with its upper left corner at
+    dest, a pair of pixel coordinates, or record it in the batch.
+    """
+    if _batch is not None:
+        _batch.append((_BLIT, surface, dest))
+        return
+    _touched(_surface.blit(surface, dest))
+
+def _drawRect(color, rect, lineWidth):
+    """
+    Draw on the background canvas the outline of rect, a pygame.Rect,
+    with lines of width lineWidth (a filled rectangle if lineWidth is
+    0) in color, a pygame.Color, or record it in the batch.
+    """
+    if _batch is not None:
+        _batch.append((_RECT, color, rect, lineWidth))
+        return
+    if (_clipRect is None) or (lineWidth < 1) or \
+        (2 * lineWidth >= min(rect.width, rect.height)):
+        _touched(pygame.draw.rect(_surface, color, rect, lineWidth))
+    else:
+        # pygame draws the outline of a clipped rectangle along the
+        # clip rectangle, so draw its four sides as filled rectangles
+        # instead (which gives the same pixels as an unclipped outline).
+        for side in ((rect.x, rect.y, rect.width, lineWidth),
+            (rect.x, rect.bottom-lineWidth, rect.width, lineWidth),
+            (rect.x, rect.y, lineWidth, rect.height),
+            (rect.right-lineWidth, rect.y, lineWidth, rect.height)):
+            pygame.draw.rect(_surface, color, side, 0)
+
+def _drawLine(color, start, end, lineWidth):
+    """
+    Draw on the background canvas a line of width lineWidth from start
+    to end, pairs of pixel coordinates, in color, a pygame.Color, or
+    record it in the batch.
+    """
+    if _batch is not None:
+        _batch.append((_LINE, color, start, end, lineWidth))
+        return
+    _touched(pygame.draw.line(_surface, color, start, end, lineWidth))
+
+def _checkNotRecording(name):
+    """
+    Raise an exception if a batch is being recorded, as the primitive
+    called name cannot be recorded in a batch and drawing it at once
+    would put it out of order.
+    """
+    if _batch is not None:
+        raise Exception(name + ' cannot be recorded in a batch')
+
 def _pixel(x, y):
     """
-    Draw on the background canvas a pixel at (x, y).
+    Draw on the background canvas a pixel at (x, y), or record it in
+    the batch.
     """
     _makeSureWindowCreated()
     xs = _scaleX(x)
     xy = _scaleY(y)
-    pygame.gfxdraw.pixel(
-        _surface,
-        int(round(xs)),
-        int(round(xy)),
-        _pygameColor(_penColor))
+    _drawRect(
+        _penPygameColor,
+        pygame.Rect(int(round(xs)), int(round(xy)), 1, 1),
+        0)
 
 def point(x, y):
     """
@@ -287,17 +428,18 @@ def point(x, y):
     if _penRadius <= 1.0:
         _pixel(x, y)
     else:
+        _checkNotRecording('point')
         xs = _scaleX(x)
         ys = _scaleY(y)
-        pygame.draw.ellipse(
+        _touched(pygame.draw.ellipse(
             _surface,
-            _pygameColor(_penColor),
+            _penPygameColor,
             pygame.Rect(
                 xs-_penRadius,
                 ys-_penRadius,
                 _penRadius*2.0,
                 _penRadius*2.0),
-            0)
+            0))
 
 def line(x0, y0, x1, y1):
     """
@@ -317,9 +459,8 @@ def line(x0, y0, x1, y1):
     y0s = _scaleY(y0)
     x1s = _scaleX(x1)
     y1s = _scaleY(y1)
-    pygame.draw.line(
-       _surface,
-       _pygameColor(_penColor),
+    _drawLine(
+       _penPygameColor,
        (x0s, y0s),
        (x1s, y1s),
        int(round(lineWidth)))
@@ -339,13 +480,14 @@ def circle(x, y, r):
     if (ws <= 1.0) and (hs <= 1.0):
         _pixel(x, y)
     else:
+        _checkNotRecording('circle')
         xs = _scaleX(x)
         ys = _scaleY(y)
-        pygame.draw.ellipse(
+        _touched(pygame.draw.ellipse(
             _surface,
-            _pygameColor(_penColor),
+            _penPygameColor,
             pygame.Rect(xs-ws/2.0, ys-hs/2.0, ws, hs),
-            int(round(_penRadius)))
+            int(round(_penRadius))))
 
 def filledCircle(x, y, r):
     """
@@ -362,13 +504,14 @@ def filledCircle(x, y, r):
     if (ws <= 1.0) and (hs <= 1.0):
         _pixel(x, y)
     else:
+        _checkNotRecording('filledCircle')
         xs = _scaleX(x)
         ys = _scaleY(y)
-        pygame.draw.ellipse(
+        _touched(pygame.draw.ellipse(
             _surface,
-            _pygameColor(_penColor),
+            _penPygameColor,
             pygame.Rect(xs-ws/2.0, ys-hs/2.0, ws, hs),
-            0)
+            0))
 
 def rectangle(x, y, w, h):
     """
@@ -389,9 +532,8 @@ def rectangle(x, y, w, h):
     else:
         xs = _scaleX(x)
         ys = _scaleY(y)
-        pygame.draw.rect(
-            _surface,
-            _pygameColor(_penColor),
+        _drawRect(
+            _penPygameColor,
             pygame.Rect(xs, ys-hs, ws, hs),
             int(round(_penRadius)))
 
@@ -414,9 +556,8 @@ def filledRectangle(x, y, w, h):
     else:
         xs = _scaleX(x)
         ys = _scaleY(y)
-        pygame.draw.rect(
-            _surface,
-            _pygameColor(_penColor),
+        _drawRect(
+            _penPygameColor,
             pygame.Rect(xs, ys-hs, ws, hs),
             0)
 
@@ -443,6 +584,7 @@ def polygon(x, y):
     """
     global _surface
     _makeSureWindowCreated()
+    _checkNotRecording('polygon')
     # Scale X and Y values.
     xScaled = []
     for xi in x:
@@ -454,11 +596,11 @@ def polygon(x, y):
     for i in range(len(x)):
         points.append((xScaled[i], yScaled[i]))
     points.append((xScaled[0], yScaled[0]))
-    pygame.draw.polygon(
+    _touched(pygame.draw.polygon(
         _surface,
-        _pygameColor(_penColor),
+        _penPygameColor,
         points,
-        int(round(_penRadius)))
+        int(round(_penRadius))))
 
 def filledPolygon(x, y):
     """
@@ -467,6 +609,7 @@ def filledPolygon(x, y):
     """
     global _surface
     _makeSureWindowCreated()
+    _checkNotRecording('filledPolygon')
     # Scale X and Y values.
     xScaled = []
     for xi in x:
@@ -478,7 +621,36 @@ def filledPolygon(x, y):
     for i in range(len(x)):
         points.append((xScaled[i], yScaled[i]))
     points.append((xScaled[0], yScaled[0]))
-    pygame.draw.polygon(_surface, _pygameColor(_penColor), points, 0)
+    _touched(pygame.draw.polygon(_surface, _penPygameColor, points, 0))
+
+def _font(bold):
+    """
+    Return the pygame font for the current font family and font size,
+    bold if bold is True. The font is created once and then reused.
+    """
+    key = (_fontFamily, _fontSize, bold)
+    font = _fonts.get(key)
+    if font is None:
+        font = pygame.font.SysFont(_fontFamily, _fontSize, bold)
+        _fonts[key] = font
+    return font
+
+def _textSurface(s, bold):
+    """
+    Return a surface with string s rendered in the current font and pen
+    color, bold if bold is True. The most recently used surfaces (up to
+    _TEXT_CACHE_SIZE) are kept, so that a string is rendered only once.
+    """
+    key = (s, _fontFamily, _fontSize, bold, _penColor)
+    surface = _textSurfaces.get(key)
+    if surface is None:
+        surface = _font(bold).render(s, 1, _penPygameColor)
+        _textSurfaces[key] = surface
+        if len(_textSurfaces) > _TEXT_CACHE_SIZE:
+            _textSurfaces.popitem(last=False)
+    else:
+        _textSurfaces.move_to_end(key)
+    return surface
 
 def text(x, y, s):
     """
@@ -489,10 +661,9 @@ def text(x, y, s):
     y = float(y)
     xs = _scaleX(x)
     ys = _scaleY(y)
-    font = pygame.font.SysFont(_fontFamily, _fontSize)
-    text = font.render(s, 1, _pygameColor(_penColor))
+    text = _textSurface(s, False)
     textpos = text.get_rect(center=(xs, ys))
-    _surface.blit(text, textpos)
+    _blit(text, textpos)
 
 def boldText(x, y, s):
     """
@@ -503,10 +674,9 @@ def boldText(x, y, s):
     y = float(y)
     xs = _scaleX(x)
     ys = _scaleY(y)
-    font = pygame.font.SysFont(_fontFamily, _fontSize, True)
-    text = font.render(s, 1, _pygameColor(_penColor))
+    text = _textSurface(s, True)
     textpos = text.get_rect(center=(xs, ys))
-    _surface.blit(text, textpos)
+    _blit(text, textpos)
 
 def picture(pic, x=None, y=None):
     """
@@ -528,7 +698,113 @@ def picture(pic, x=None, y=None):
     ws = pic.width()
     hs = pic.height()
     picSurface = pic._surface # violates encapsulation
-    _surface.blit(picSurface, [xs-ws/2.0, ys-hs/2.0, ws, hs])
+    _blit(picSurface, (xs-ws/2.0, ys-hs/2.0))
+
+def _pictureGridMaps(rowCount, colCount, x, y, ws, hs):
+    """
+    Return the region of the canvas covered by the pictures of size
+    (ws, hs) centered at (x + col, y + row) for each of the rowCount
+    rows and colCount columns as in pictureGrid(), and for each pixel
+    column and each pixel row of the region, the column (row) of the
+    picture covering it, its position on the picture, and whether it
+    is covered by a picture. The maps are kept while they are used for
+    the same canvas (or layer) and pictures.
+    """
+    import numpy  # used for computing the maps for all the pixels at once
+    global _pictureGridMaps_
+    key = (_xmin, _xmax, _ymin, _ymax, _canvasWidth, _canvasHeight,
+        rowCount, colCount, x, y, ws, hs)
+    if (_pictureGridMaps_ is not None) and (_pictureGridMaps_[0] == key):
+        return _pictureGridMaps_[1]
+    # The upper left pixel of the picture of each column and row, as in
+    # picture() but rounded down rather than toward 0, so that the
+    # pictures do not overlap when they are partly outside the canvas.
+    xs0 = numpy.floor(_scaleX(x + numpy.arange(colCount)) - ws/2.0).astype(int)
+    ys0 = numpy.floor(_scaleY(y + numpy.arange(rowCount)) - hs/2.0).astype(int)
+    region = pygame.Rect(int(xs0.min()), int(ys0.min()),
+        int(xs0.max() - xs0.min()) + ws, int(ys0.max() - ys0.min()) + hs)
+    region = region.clip(pygame.Rect(0, 0, _canvasWidth, _canvasHeight))
+    pixelXs = numpy.arange(region.left, region.right)
+    cols = numpy.searchsorted(xs0, pixelXs, 'right') - 1
+    offsetXs = pixelXs - xs0[cols]
+    # The rows are from the top of the canvas (decreasing y) here.
+    pixelYs = numpy.arange(region.top, region.bottom)
+    rows = (rowCount - 1) - \
+        (numpy.searchsorted(ys0[::-1], pixelYs, 'right') - 1)
+    offsetYs = pixelYs - ys0[rows]
+    maps = (region, cols, rows, numpy.minimum(offsetXs, ws - 1),
+        numpy.minimum(offsetYs, hs - 1), offsetXs < ws, offsetYs < hs)
+    _pictureGridMaps_ = (key, maps)
+    return maps
+
+def pictureGrid(cells, pics, x=0.0, y=0.0):
+    """
+    Draw on the background canvas the picture pics[k] centered at
+    (x + col, y + row) for each row and column of cells, a 2D NumPy
+    array of integers, where k = cells[row][col] is not 0. pics is a
+    sequence of objects of class picture.Picture of the same size
+    (pics[0] is not used). The pixels of the pictures are copied to
+    the canvas at once with NumPy, rather than by drawing each picture,
+    so that very large arrays of cells can be drawn quickly. The
+    pictures must be at most 1 by 1 in size so that they do not
+    overlap, and transparent pixels are not blended. A picture partly
+    outside the canvas on the left or the top may be drawn 1 pixel away
+    from where picture() draws it. pictureGrid() cannot be recorded in
+    a batch.
+    """
+    import numpy  # used for copying the pixels of the pictures at once
+    global _pictureGridAtlas
+    _makeSureWindowCreated()
+    _checkNotRecording('pictureGrid')
+    sample = next(pic for pic in pics[1:] if pic is not None)
+    ws = sample.width()
+    hs = sample.height()
+    # The pixels of all the pictures in the pixel format of the canvas,
+    # kept while the same pictures are drawn on the same kind of surface.
+    surfaceFormat = (_surface.get_bitsize(), _surface.get_masks())
+    if (_pictureGridAtlas is None) or \
+        (_pictureGridAtlas[1] != surfaceFormat) or \
+        (len(_pictureGridAtlas[0]) != len(pics)) or \
+        any(a is not b for a, b in zip(_pictureGridAtlas[0], pics)):
+        atlas = numpy.zeros((len(pics), ws, hs, 3), dtype=numpy.uint8)
+        for k in range(1, len(pics)):
+            if pics[k] is not None:
+                atlas[k] = pygame.surfarray.array3d(pics[k]._surface)
+        atlas = pygame.surfarray.map_array(_surface, atlas.reshape(-1, hs, 3))
+        # The pixels are used with the rows as the first axis as they are
+        # stored in the memory.
+        atlas = numpy.ascontiguousarray(
+            atlas.reshape(len(pics), ws, hs).transpose(0, 2, 1))
+        _pictureGridAtlas = (tuple(pics), surfaceFormat, atlas)
+    atlas = _pictureGridAtlas[2]
+    region, cols, rows, offsetXs, offsetYs, insideXs, insideYs = \
+        _pictureGridMaps(cells.shape[0], cells.shape[1], x, y, ws, hs)
+    # Only the part of the region inside the clip rectangle is drawn.
+    clip = region.clip(_surface.get_clip())
+    if (clip.width == 0) or (clip.height == 0):
+        return
+    sx = slice(clip.left - region.left, clip.right - region.left)
+    sy = slice(clip.top - region.top, clip.bottom - region.top)
+    cols = cols[sx]
+    rows = rows[sy]
+    col0 = cols[0]
+    row0 = rows[-1]
+    # The drawn cells with all their pictures next to each other, with
+    # the pixel rows from the bottom of the canvas.
+    drawn = cells[row0:rows[0] + 1, col0:cols[-1] + 1]
+    image = atlas[drawn].transpose(0, 2, 1, 3).reshape(
+        drawn.shape[0] * hs, drawn.shape[1] * ws)
+    pixelRows = (rows - row0) * hs + offsetYs[sy]
+    pixelCols = (cols - col0) * ws + offsetXs[sx]
+    colors = image.take(pixelRows, 0).take(pixelCols, 1)
+    covered = (drawn != 0).take(rows - row0, 0).take(cols - col0, 1)
+    covered &= insideYs[sy, numpy.newaxis]
+    covered &= insideXs[numpy.newaxis, sx]
+    pixels = pygame.surfarray.pixels2d(_surface).T
+    numpy.copyto(pixels[clip.top:clip.bottom, clip.left:clip.right],
+        colors, where=covered, casting='unsafe')
+    del pixels  # unlock the surface
+    _touched(clip)
 
 def clear(c=WHITE):
     """
@@ -536,7 +812,8 @@ def clear(c=WHITE):
     object of class color.Color. c defaults to stddraw.WHITE.
     """
     _makeSureWindowCreated()
-    _surface.fill(_pygameColor(c))
+    _checkNotRecording('clear')
+    _touched(_surface.fill(_pygameColor(c)))
 
 def save(f):
     """
@@ -558,12 +835,220 @@ def save(f):
 
 #-----------------------------------------------------------------------
 
+# Functions for drawing batches of recorded primitives.
+
+def beginBatch():
+    """
+    Start recording the subsequent calls of line(), rectangle(),
+    filledRectangle(), square(), filledSquare(), text(), boldText() and
+    picture() into a batch rather than drawing them (as well as points
+    and circles drawn as single pixels). The other primitives raise an
+    exception while a batch is recorded. The coordinates and the colors
+    are converted for drawing when the calls are recorded, so the batch
+    can be drawn again and again by calling drawBatch() until the size
+    or the scale of the canvas changes (see canvasGeneration). Call
+    endBatch() to stop recording.
+    """
+    global _batch
+    _makeSureWindowCreated()
+    _batch = []
+
+def endBatch():
+    """
+    Stop recording the primitives started by the most recent call of
+    beginBatch(), and return the batch of the recorded primitives for
+    the current canvas generation.
+    """
+    global _batch
+    commands = _batch
+    _batch = None
+    # Consecutive pictures and texts are drawn by a single call.
+    batch = []
+    for command in commands:
+        if command[0] == _BLIT:
+            if batch and (batch[-1][0] == _BLITS):
+                batch[-1][1].append(command[1:])
+            else:
+                batch.append((_BLITS, [command[1:]]))
+        else:
+            batch.append(command)
+    return (_canvasGeneration, batch)
+
+def drawBatch(batch):
+    """
+    Draw on the background canvas the primitives in batch, a batch
+    returned by endBatch(), in the order in which they were recorded.
+    Raise an exception if the size or the scale of the canvas has been
+    set since the batch was recorded.
+    """
+    _makeSureWindowCreated()
+    generation, batch = batch
+    if generation != _canvasGeneration:
+        raise Exception(
+            'The batch was recorded for another canvas size or scale')
+    # The drawn rectangles are only needed in dirty-region mode.
+    track = (_dirtyRects is not None) and (_clipRect is None) and \
+        (not _layerStack) and (not _showAll)
+    for command in batch:
+        kind = command[0]
+        if kind == _BLITS:
+            if track:
+                _dirtyRects.extend(_surface.blits(command[1]))
+            else:
+                _surface.blits(command[1], False)
+        elif kind == _RECT:
+            _drawRect(command[1], command[2], command[3])
+        else:
+            _drawLine(command[1], command[2], command[3], command[4])
+
+#-----------------------------------------------------------------------
+
+# Functions for drawing on offscreen layers.
+
+def canvasGeneration():
+    """
+    Return a number that changes whenever the size or the scale of the
+    canvas is set. Layers drawn for one generation (see beginLayer)
+    must be drawn again when the generation changes.
+    """
+    return _canvasGeneration
+
+def beginLayer(x=None, y=None, w=None, h=None, transparent=False,
+    layer=None):
+    """
+    Redirect the subsequent drawing to a new offscreen layer covering
+    the rectangle of width w and height h whose lower left point is
+    (x, y), at the current scale of the canvas. The layer covers the
+    whole canvas by default. If transparent is True, the parts of the
+    layer that are not drawn on are transparent. If layer is a layer
+    returned by endLayer() for the same rectangle, draw on it again
+    rather than on a new layer. Call endLayer() to get the layer.
+    """
+    global _surface
+    global _canvasWidth
+    global _canvasHeight
+    global _xmin
+    global _xmax
+    global _ymin
+    global _ymax
+    global _batch
+    global _clipRect
+    _makeSureWindowCreated()
+    if x is None:
+        x, y, w, h = _xmin, _ymin, _xmax - _xmin, _ymax - _ymin
+    # The size of the layer in pixels, and the size of a pixel in user
+    # coordinates which is kept the same as on the canvas.
+    ws = max(int(_factorX(float(w))), 1)
+    hs = max(int(_factorY(float(h))), 1)
+    pixelW = abs(_xmax - _xmin) / _canvasWidth
+    pixelH = abs(_ymax - _ymin) / _canvasHeight
+    if layer is None:
+        layer = Picture(ws, hs)
+        if transparent:
+            layer._surface = pygame.Surface((ws, hs), pygame.SRCALPHA)
+            layer._surface.fill((0, 0, 0, 0))
+    # A batch being recorded is suspended while drawing on the layer, and
+    # the clip rectangle of the canvas is kept.
+    _layerStack.append((layer, _surface, _canvasWidth, _canvasHeight,
+        _xmin, _xmax, _ymin, _ymax, _batch, _clipRect))
+    _batch = None
+    _clipRect = None
+    _surface = layer._surface # violates encapsulation
+    _canvasWidth = ws
+    _canvasHeight = hs
+    _xmin = float(x)
+    _xmax = _xmin + ws * pixelW
+    _ymin = float(y)
+    _ymax = _ymin + hs * pixelH
+
+def endLayer():
+    """
+    Stop drawing on the layer started by the most recent call of
+    beginLayer(), and return that layer as a Picture object which can
+    be drawn by calling picture().
+    """
+    global _surface
+    global _canvasWidth
+    global _canvasHeight
+    global _xmin
+    global _xmax
+    global _ymin
+    global _ymax
+    global _batch
+    global _clipRect
+    # Remove any clip rectangle set while drawing on the layer.
+    _surface.set_clip(None)
+    (layer, _surface, _canvasWidth, _canvasHeight,
+        _xmin, _xmax, _ymin, _ymax, _batch, _clipRect) = _layerStack.pop()
+    # Run-length encode transparent layers, which are mostly empty, so
+    # that they are drawn quickly.
+    layerSurface = layer._surface # violates encapsulation
+    if layerSurface.get_flags() & pygame.SRCALPHA:
+        layerSurface.set_alpha(255, pygame.RLEACCEL)
+    return layer
+
+# Functions for showing only the changed regions of the canvas.
+
+def setDirtyRegions(enabled=True):
+    """
+    Turn the dirty-region mode on if enabled is True, and off
+    otherwise. In dirty-region mode, show() copies only the rectangles
+    of the background canvas drawn on since the previous show() to the
+    window canvas, rather than the whole background canvas.
+    """
+    global _dirtyRects
+    global _showAll
+    if enabled:
+        _dirtyRects = []
+    else:
+        _dirtyRects = None
+    _showAll = True
+
+def setClip(x=None, y=None, w=None, h=None):
+    """
+    Restrict the subsequent drawing on the background canvas to the
+    rectangle of width w and height h whose lower left point is (x, y),
+    which is shown by the next show() in dirty-region mode. Remove the
+    restriction if x is None.
+    """
+    global _clipRect
+    _makeSureWindowCreated()
+    if x is None:
+        _clipRect = None
+        _surface.set_clip(None)
+        return
+    x = float(x)
+    y = float(y)
+    # The pixels partly covered by the rectangle are included.
+    xs0 = math.floor(_scaleX(x))
+    xs1 = math.ceil(_scaleX(x + float(w)))
+    ys0 = math.floor(_scaleY(y + float(h)))
+    ys1 = math.ceil(_scaleY(y))
+    _clipRect = pygame.Rect(xs0, ys0, xs1 - xs0, ys1 - ys0)
+    _clipRect = _clipRect.clip(_surface.get_rect())
+    _surface.set_clip(_clipRect)
+    if (_dirtyRects is not None) and (not _layerStack):
+        _dirtyRects.append(_clipRect)
+
+#-----------------------------------------------------------------------
+
 def _show():
     """
-    Copy the background canvas to the window canvas.
+    Copy the background canvas to the window canvas. In dirty-region
+    mode, only copy the rectangles drawn on since the previous call.
     """
-    _background.blit(_surface, (0, 0))
-    pygame.display.flip()
+    global _showAll
+    if (_dirtyRects is None) or _showAll or \
+        (len(_dirtyRects) > _MAX_DIRTY_RECTS):
+        _background.blit(_surface, (0, 0))
+        pygame.display.flip()
+        _showAll = False
+    else:
+        for rect in _dirtyRects:
+            _background.blit(_surface, rect, rect)
+        pygame.display.update(_dirtyRects)
+    if _dirtyRects is not None:
+        del _dirtyRects[:]
     _checkForEvents()
 
 def _showAndWaitForever():
@@ -573,10 +1058,29 @@ def _showAndWaitForever():
     """
     _makeSureWindowCreated()
     _show()
-    QUANTUM = .1
     while True:
-        time.sleep(QUANTUM)
-        _checkForEvents()
+        _handleEvent(pygame.event.wait())
+
+def _waitForEvents(sec):
+    """
+    Wait for sec seconds as measured by a monotonic clock. Block on
+    the event queue instead of polling it, and handle each event as
+    soon as it arrives. The fraction of a millisecond left at the
+    end, which the event queue cannot time, is slept.
+    """
+    deadline = time.perf_counter() + sec
+    while True:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0.0:
+            return
+        msec = int(remaining * 1000.0)
+        if msec == 0:
+            time.sleep(remaining)
+            return
+        event = pygame.event.wait(msec)
+        if event.type != pygame.NOEVENT:
+            _handleEvent(event)
+            _checkForEvents()
 
 def show(msec=float('inf')):
     """
@@ -588,20 +1092,34 @@ def show(msec=float('inf')):
 
     _makeSureWindowCreated()
     _show()
-    _checkForEvents()
+    _waitForEvents(msec / 1000.0)
 
-    # Sleep for the required time, but check for events every
-    # QUANTUM seconds.
-    QUANTUM = .01
-    sec = msec / 1000.0
-    if sec < QUANTUM:
-        time.sleep(sec)
-        return
-    secondsWaited = 0.0
-    while secondsWaited < sec:
-        time.sleep(QUANTUM)
-        secondsWaited += QUANTUM
-        _checkForEvents()
+def waitForInput(msec=float('inf')):
+    """
+    Copy the background canvas to the window canvas, and then wait
+    until the user types a key or left-clicks, or until msec
+    milliseconds have passed. msec defaults to infinity. The window
+    canvas is copied again only when the window asks for it. Return
+    True if a key has been typed or the mouse has been left-clicked,
+    and False otherwise.
+    """
+    _makeSureWindowCreated()
+    _show()
+    deadline = time.perf_counter() + msec / 1000.0
+    while (not _keysTyped) and (not _mousePressed):
+        if _showAll:
+            _show()
+            continue
+        if msec == float('inf'):
+            event = pygame.event.wait()
+        else:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0.0:
+                return False
+            event = pygame.event.wait(max(int(math.ceil(remaining * 1000.0)), 1))
+        if event.type != pygame.NOEVENT:
+            _handleEvent(event)
+    return True
 
 #-----------------------------------------------------------------------
 
@@ -648,10 +1166,21 @@ def _saveToFile():
 def _checkForEvents():
     """
     Check if any new event has occured (such as a key typed or button
-    pressed).  If a key has been typed, then put that key in a queue.
+    pressed), and handle each of them.
     """
-    global _surface
-    global _keysTyped
+    _makeSureWindowCreated()
+
+    for event in pygame.event.get():
+        _handleEvent(event)
+
+def _handleEvent(event):
+    """
+    Handle the event. If a key has been typed, then put that key in a
+    queue.
+    """
+    global _repeatingKey
+    global _nextRepeatTime
+    global _showAll
     
     #-------------------------------------------------------------------
     # Begin added by Alan J. Broder
@@ -661,57 +1190,103 @@ def _checkForEvents():
     #-------------------------------------------------------------------
     # End added by Alan J. Broder
     #-------------------------------------------------------------------
-    
-    _makeSureWindowCreated()
 
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            sys.exit()
-        elif event.type == pygame.KEYDOWN:
-            _keysTyped = [pygame.key.name(event.key)] + _keysTyped
-        elif (event.type == pygame.MOUSEBUTTONUP) and \
-            (event.button == 3):
-            _saveToFile()
-            
-        #---------------------------------------------------------------
-        # Begin added by Alan J. Broder
-        #---------------------------------------------------------------
-        # Every time the mouse button is pressed, remember
-        # the mouse position as of that press.
-        elif (event.type == pygame.MOUSEBUTTONDOWN) and \
-            (event.button == 1): 
-            _mousePressed = True
-            _mousePos = event.pos                      
-        #---------------------------------------------------------------
-        # End added by Alan J. Broder
-        #---------------------------------------------------------------
+    if event.type == pygame.QUIT:
+        sys.exit()
+    elif event.type == pygame.KEYDOWN:
+        t = time.perf_counter()
+        _repeatKeys(t)
+        key = pygame.key.name(event.key)
+        _keysTyped.append((key, t))
+        if key in _repeatedKeys:
+            _repeatingKey = key
+            _nextRepeatTime = t + _keyRepeatDelay
+    elif event.type == pygame.KEYUP:
+        _repeatKeys(time.perf_counter())
+        if pygame.key.name(event.key) == _repeatingKey:
+            _repeatingKey = None
+    elif event.type == pygame.VIDEOEXPOSE:
+        # The window canvas must be shown again as a whole.
+        _showAll = True
+    elif (event.type == pygame.MOUSEBUTTONUP) and \
+        (event.button == 3):
+        _saveToFile()
+        
+    #-------------------------------------------------------------------
+    # Begin added by Alan J. Broder
+    #-------------------------------------------------------------------
+    # Every time the mouse button is pressed, remember
+    # the mouse position as of that press.
+    elif (event.type == pygame.MOUSEBUTTONDOWN) and \
+        (event.button == 1): 
+        _mousePressed = True
+        _mousePos = event.pos                      
+    #-------------------------------------------------------------------
+    # End added by Alan J. Broder
+    #-------------------------------------------------------------------
 
 #-----------------------------------------------------------------------
 
 # Functions for retrieving keys
 
+def _repeatKeys(t):
+    """
+    Put the repeats of the key being repeated that are due by time t
+    in the queue of the keys typed, each with the time it is due.
+    """
+    global _nextRepeatTime
+    while (_repeatingKey is not None) and (_nextRepeatTime <= t):
+        _keysTyped.append((_repeatingKey, _nextRepeatTime))
+        _nextRepeatTime += _keyRepeatInterval
+
+def setKeyRepeat(keys=(), delay=0.0, interval=0.0):
+    """
+    Repeat each of the keys in keys while it is held down: the key is
+    typed again delay milliseconds after it has been typed, and then
+    every interval milliseconds. As with a keyboard, only the key held
+    down most recently is repeated. By default, no key is repeated.
+    """
+    global _repeatedKeys
+    global _keyRepeatDelay
+    global _keyRepeatInterval
+    global _repeatingKey
+    if (keys) and (interval <= 0.0):
+        raise Exception('The key repeat interval must be positive')
+    _repeatedKeys = frozenset(keys)
+    _keyRepeatDelay = delay / 1000.0
+    _keyRepeatInterval = interval / 1000.0
+    _repeatingKey = None
+
 def hasNextKeyTyped():
     """
     Return True if the queue of the keys the user typed is not empty.
     Otherwise return False.
     """
-    global _keysTyped
-    return _keysTyped != []
+    _repeatKeys(time.perf_counter())
+    return len(_keysTyped) != 0
 
 def nextKeyTyped():
     """
     Remove the first key from the queue of the keys that the user typed,
     and return that key.
     """
-    global _keysTyped
-    return _keysTyped.pop()
+    return _keysTyped.popleft()[0]
+
+def nextKeyTypedWithTime():
+    """
+    Remove the first key from the queue of the keys that the user typed,
+    and return that key and the time.perf_counter() value at which it
+    was typed as a (key, time) pair.
+    """
+    return _keysTyped.popleft()
 
 def clearKeysTyped():
     """
-    Clear all the keys in the queue of the keys that the user typed.
+    Clear all the keys in the queue of the keys that the user typed,
+    including the repeats of a key held down that are due.
     """
-    global _keysTyped
-    _keysTyped = []
+    _repeatKeys(time.perf_counter())
+    _keysTyped.clear()
 
 #-----------------------------------------------------------------------
 # Begin added by Alan J. Broder
@@ -923,6 +1498,29 @@ def _regressionTest():
 
 #-----------------------------------------------------------------------
 
+def _timingTest():
+    """
+    Measure how long show(msec) takes for several values of msec,
+    and how much processor time an idle show(1000) uses.
+    """
+    clear()
+    show(0.0)
+    print('msec   mean error   max error   (ms, over 50 calls)')
+    for msec in [0.0, 1.0, 5.0, 10.0, 1000.0 / 60.0, 50.0]:
+        errors = []
+        for i in range(50):
+            start = time.perf_counter()
+            show(msec)
+            errors.append((time.perf_counter() - start) * 1000.0 - msec)
+        print('%6.2f %10.3f %11.3f' % (msec, sum(errors) / len(errors),
+            max(errors)))
+    start = time.process_time()
+    show(1000.0)
+    print('processor time of show(1000): %.2f ms' %
+        ((time.process_time() - start) * 1000.0))
+
+#-----------------------------------------------------------------------
+
 def _main():
     """
     Dispatch to a function that does regression testing, or to a
@@ -931,6 +1529,8 @@ def _main():
     import sys
     if len(sys.argv) == 1:
         _regressionTest()
+    elif sys.argv[1] == 'timingTest':
+        _timingTest()
     elif sys.argv[1] == 'getFileName':
         _getFileName()
     elif sys.argv[1] == 'confirmFileSave':
@@ -0,0 +1,139 @@
+import collections  # used for the deque of the tetrominoes created in advance
+import numpy as np  # fundamental Python module for scientific computing
+from tetromino import Tetromino, SHAPES  # used for creating the tetrominoes
+
+# the types (shapes) of the tetrominoes, indexed by the type indexes generated
+# by the randomizers
+TYPES = ('O', 'I', 'Z', 'J', 'L', 'T', 'S')
+
+
+# A class for picking each tetromino type uniformly at random independently of
+# the previous tetrominoes
+class UniformRandomizer:
+    # A method that returns an array of the indexes of the types (see TYPES) of
+    # count tetrominoes generated by using the given NumPy random generator
+    def types(self, rng, count):
+        return rng.integers(0, len(TYPES), count)
+
+
+# A class for picking the tetromino types from shuffled bags that contain each
+# type once (the 7-bag randomizer), so each type comes once in every 7
+# tetrominoes and the same type never comes more than twice in a row
+class BagRandomizer:
+    # A method that returns an array of the indexes of the types (see TYPES) of
+    # the tetrominoes in the smallest number of whole bags that contain at least
+    # count tetrominoes, generated by using the given NumPy random generator
+    def types(self, rng, count):
+        bags = -(-count // len(TYPES))
+        types = np.tile(np.arange(len(TYPES)), (bags, 1))
+        return rng.permuted(types, axis=1).ravel()
+
+
+# A class for modeling the queue of the tetrominoes that enter the game grid.
+# The types of the tetrominoes (see the randomizer classes above), the numbers
+# on their tiles and their columns are generated in blocks by using a NumPy
+# random generator, so creating a tetromino takes no random calls, and the
+# same seed always gives the same tetrominoes.
+class PieceQueue:
+    # the number of tetrominoes generated at once
+    block_size = 256
+
+    # A constructor for creating a queue of tetrominoes for a game grid with the
+    # given dimensions, by using the given seed (a random seed when it is None)
+    # and randomizer (a UniformRandomizer when it is None)
+    def __init__(self, grid_height, grid_width, seed=None, randomizer=None):
+        self.grid_height = grid_height
+        self.grid_width = grid_width
+        self.rng = np.random.default_rng(seed)
+        if randomizer is None:
+            randomizer = UniformRandomizer()
+        self.randomizer = randomizer
+        # the type indexes, the tile exponents (a row of 4 for each tetromino)
+        # and the columns of the tetrominoes in the current block, stored as
+        # compact arrays, and the index of the next one
+        self.types = self.exponents = self.columns = None
+        self.index = 0
+        # the tetrominoes created in advance for the preview (see preview)
+        self.upcoming = collections.deque()
+
+    # A method for generating the next block of tetrominoes
+    def generate(self):
+        types = self.randomizer.types(self.rng, PieceQueue.block_size)
+        count = len(types)
+        # a random number (2 or 4) for each of the four tiles of each tetromino
+        exponents = self.rng.integers(1, 3, (count, 4))
+        # a random column for the bottom left cell of each tetromino such that
+        # the tile matrix (n x n) of the tetromino is inside the game grid
+        sizes = np.array([SHAPES[shape][0] for shape in TYPES])[types]
+        columns = self.rng.integers(0, self.grid_width - sizes + 1)
+        self.types = types.astype(np.uint8)
+        self.exponents = exponents.astype(np.uint8)
+        self.columns = columns.astype(np.uint8)
+        self.index = 0
+
+    # A method for creating the next tetromino of the generated blocks (with
+    # its bottom left cell on the top row of the game grid)
+    def create(self):
+        if self.types is None or self.index == len(self.types):
+            self.generate()
+        i = self.index
+        self.index += 1
+        return Tetromino(TYPES[self.types[i]], int(self.columns[i]),
+                         self.grid_height - 1, self.exponents[i].tolist())
+
+    # A method that removes the next tetromino from the queue and returns it
+    def next(self):
+        if self.upcoming:
+            return self.upcoming.popleft()
+        return self.create()
+
+    # A method that returns the list of the next count tetrominoes in the queue
+    # without removing them (the same tetrominoes are returned by next)
+    def preview(self, count):
+        while len(self.upcoming) < count:
+            self.upcoming.append(self.create())
+        return [self.upcoming[i] for i in range(count)]
+
+
+# A function for testing the queues of tetrominoes and measuring the time
+# taken for creating a tetromino
+def _regressionTest():
+    import random
+    import time
+    for randomizer in (UniformRandomizer(), BagRandomizer()):
+        name = type(randomizer).__name__
+        # the same seed gives the same tetrominoes, also after a preview
+        queue = PieceQueue(20, 12, 2048, randomizer)
+        other = PieceQueue(20, 12, 2048, randomizer)
+        other.preview(5)
+        for i in range(2000):
+            a, b = queue.next(), other.next()
+            assert a.type == b.type and a.tile_exponents == b.tile_exponents
+            assert a.bottom_left_cell.x == b.bottom_left_cell.x
+            # the tile matrix of each tetromino is inside the game grid
+            assert 0 <= a.bottom_left_cell.x <= 12 - a.orientation.n, name
+            assert set(a.tile_exponents) <= {1, 2}, name
+        # each bag of 7 tetrominoes contains each type once
+        if isinstance(randomizer, BagRandomizer):
+            queue = PieceQueue(20, 12, 7, randomizer)
+            for i in range(1000):
+                bag = [queue.next().type for j in range(len(TYPES))]
+                assert sorted(bag) == sorted(TYPES), bag
+        # the number of tetrominoes created per second
+        queue = PieceQueue(20, 12, 1, randomizer)
+        start = time.perf_counter()
+        for i in range(100000):
+            queue.next()
+        duration = (time.perf_counter() - start) / 100000
+        print("%-17s %5.2f us per tetromino" % (name, duration * 1e6))
+    # the tetrominoes created with the random module, for comparison
+    start = time.perf_counter()
+    for i in range(100000):
+        shape = TYPES[random.randint(0, len(TYPES) - 1)]
+        Tetromino(shape, random.randint(0, 12 - SHAPES[shape][0]), 19)
+    duration = (time.perf_counter() - start) / 100000
+    print("%-17s %5.2f us per tetromino" % ("random module", duration * 1e6))
+
+
+if __name__ == '__main__':
+    _regressionTest()
@@ -0,0 +1,64 @@
+import lib.stddraw as stddraw  # for drawing the screen and waiting for the user input
+from lib.color import Color  # used for coloring the screen
+
+
+# A class for modeling a screen (such as the game menu) that is drawn once and
+# then waits for the user to click one of its buttons, without redrawing or
+# displaying anything while nothing happens
+class Screen:
+    # the colors used for the screens
+    background_color = Color(42, 69, 99)
+    button_color = Color(25, 255, 228)
+    text_color = Color(31, 160, 239)
+
+    # A constructor for creating a screen by clearing the drawing canvas
+    def __init__(self):
+        # the button table as (x, y, width, height, value) for each button,
+        # where (x, y) is the bottom left corner of the button
+        self.buttons = []
+        stddraw.clear(Screen.background_color)
+
+    # A method for adding a button with the given text at its center, which
+    # is drawn as a filled rectangle with the given bottom left corner (x, y)
+    # and dimensions and returns the given value when it is clicked (the text
+    # is drawn with the current font family and font size, and the colors are
+    # the colors of the screens unless they are given)
+    def add_button(self, x, y, width, height, text, value, button_color=None,
+                   text_color=None, bold=False):
+        if button_color is None:
+            button_color = Screen.button_color
+        if text_color is None:
+            text_color = Screen.text_color
+        stddraw.setPenColor(button_color)
+        stddraw.filledRectangle(x, y, width, height)
+        stddraw.setPenColor(text_color)
+        if bold:
+            stddraw.boldText(x + width / 2, y + height / 2, text)
+        else:
+            stddraw.text(x + width / 2, y + height / 2, text)
+        self.buttons.append((x, y, width, height, value))
+
+    # A method for finding the button at the given location (returns the value
+    # of the button or None when there is no button at this location)
+    def button_at(self, x, y):
+        for button_x, button_y, width, height, value in self.buttons:
+            if button_x <= x <= button_x + width and \
+                    button_y <= y <= button_y + height:
+                return value
+        return None
+
+    # A method for displaying the screen and waiting until one of its buttons is
+    # clicked (returns the value of the clicked button)
+    def wait(self):
+        # the clicks and the keys typed before the screen is displayed are
+        # discarded
+        stddraw.mousePressed()
+        stddraw.clearKeysTyped()
+        while True:
+            # block until the user clicks or types a key
+            stddraw.waitForInput()
+            if stddraw.mousePressed():
+                value = self.button_at(stddraw.mouseX(), stddraw.mouseY())
+                if value is not None:
+                    return value
+            stddraw.clearKeysTyped()
@@ -1,143 +1,128 @@
-from tile import Tile  # used for modeling each tile on the tetrominoes
+from tile import Tile  # used for the numbers on and for drawing the tiles
 from point import Point  # used for tile positions
-import copy as cp  # the copy module is used for copying tiles and positions
-import random  # the random module is used for generating random values
-import numpy as np  # the fundamental Python module for scientific computing
+
+
+# the occupied (non-empty) cells in the tile matrix of each tetromino type in
+# its initial rotation state as (column_index, row_index) pairs, and n = number
+# of rows = number of columns in the tile matrix (see the documentation given
+# with this code)
+SHAPES = {
+    'I': (4, [(1, 0), (1, 1), (1, 2), (1, 3)]),
+    'O': (2, [(0, 0), (1, 0), (0, 1), (1, 1)]),
+    'Z': (3, [(0, 1), (1, 1), (1, 2), (2, 2)]),
+    'J': (3, [(0, 0), (2, 0), (1, 0), (2, 1)]),
+    'L': (3, [(0, 0), (2, 0), (1, 0), (0, 1)]),
+    'T': (3, [(0, 0), (2, 0), (1, 0), (1, 1)]),
+    'S': (3, [(0, 1), (2, 0), (1, 0), (1, 1)]),
+}
+
+
+# A class for modeling a rotation state of a tetromino type with the data
+# used for moving, rotating, drawing and locking the tetromino (the four
+# rotation states of each type are computed once in ROTATIONS below)
+class Orientation:
+    # A constructor for creating a rotation state with the given occupied cells
+    # as (column_index, row_index) pairs in an n x n tile matrix
+    def __init__(self, n, cells):
+        self.n = n
+        self.cells = cells
+        # the offsets (dx, dy) of the occupied cells from the bottom left cell
+        self.offsets = [(col, (n - 1) - row) for col, row in cells]
+        # the bounding box of the occupied cells in the tile matrix
+        cols, rows = [col for col, row in cells], [row for col, row in cells]
+        self.min_col, self.max_col = min(cols), max(cols)
+        self.min_row, self.max_row = min(rows), max(rows)
+        # the edge profiles: the column index of the leftmost and the rightmost
+        # tile in each row and the offset of the bottommost tile from the bottom
+        # left cell in each column (None for an empty row or column)
+        self.left_profile, self.right_profile = [None] * n, [None] * n
+        self.bottom_profile = [None] * n
+        for dx, dy in self.offsets:
+            if self.left_profile[dy] is None or dx < self.left_profile[dy]:
+                self.left_profile[dy] = dx
+            if self.right_profile[dy] is None or dx > self.right_profile[dy]:
+                self.right_profile[dy] = dx
+            if self.bottom_profile[dx] is None or dy < self.bottom_profile[dx]:
+                self.bottom_profile[dx] = dy
+        # the occupancy bit mask of each row from the bottom (bit dx is set
+        # when the cell with the offsets (dx, dy) is occupied) used for the
+        # collision checks on the game grid
+        self.row_masks = [0] * n
+        for dx, dy in self.offsets:
+            self.row_masks[dy] |= 1 << dx
+        # the masks of the leftmost and the rightmost tile of each row and the
+        # bottommost tile of each column (only these tiles are checked when
+        # the tetromino is moved left, right or down)
+        self.left_masks, self.right_masks = [0] * n, [0] * n
+        self.bottom_masks = [0] * n
+        for dy in range(n):
+            if self.left_profile[dy] is not None:
+                self.left_masks[dy] = 1 << self.left_profile[dy]
+                self.right_masks[dy] = 1 << self.right_profile[dy]
+        for dx in range(n):
+            if self.bottom_profile[dx] is not None:
+                self.bottom_masks[self.bottom_profile[dx]] |= 1 << dx
+        # the offsets (dx, dy) of the bottommost tile in each column (compared
+        # with the heights of the columns of the game grid for dropping)
+        self.bottom_offsets = [(dx, dy) for dx, dy in enumerate(self.bottom_profile)
+                               if dy is not None]
+
+    # A method that returns the next rotation state (rotated clockwise)
+    def rotated(self):
+        # the cell at (col, row) is moved to (n - 1 - row, col) by the rotation
+        return Orientation(self.n, [((self.n - 1) - row, col)
+                                    for col, row in self.cells])
+
+
+# the four rotation states of each tetromino type (ROTATIONS[type][rotation])
+ROTATIONS = {}
+for _shape, (_n, _cells) in SHAPES.items():
+    ROTATIONS[_shape] = [Orientation(_n, _cells)]
+    for _ in range(3):
+        ROTATIONS[_shape].append(ROTATIONS[_shape][-1].rotated())
 
 
 # A class for modeling tetrominoes with 3 out of 7 different types as I, O and Z
 class Tetromino:
-    # the dimensions of the game grid (defined as class variables)
-    grid_height, grid_width = None, None
+    # the attributes of the tetrominoes are stored in slots instead of a
+    # dictionary for each tetromino
+    __slots__ = ("type", "rotation", "orientation", "tile_exponents",
+                 "bottom_left_cell")
 
-    # A constructor for creating a tetromino with a given shape (type)
-    def __init__(self, shape):
+    # A constructor for creating a tetromino with a given shape (type) with its
+    # bottom left cell at the given column x and row y (the top row of the game
+    # grid when it enters the grid), and the given exponents of the numbers on
+    # its tiles (random when they are not given, see piece_queue.py for
+    # generating them in advance)
+    def __init__(self, shape, x, y, tile_exponents=None):
         self.type = shape  # set the type of this tetromino
-        # determine the occupied (non-empty) cells in the tile matrix based on
-        # the shape of this tetromino (see the documentation given with this code)
-        occupied_cells = []
-        if self.type == 'I':
-            n = 4  # n = number of rows = number of columns in the tile matrix
-            # shape of the tetromino I in its initial rotation state
-            occupied_cells.append((1, 0))  # (column_index, row_index)
-            occupied_cells.append((1, 1))
-            occupied_cells.append((1, 2))
-            occupied_cells.append((1, 3))
-        elif self.type == 'O':
-            n = 2  # n = number of rows = number of columns in the tile matrix
-            # shape of the tetromino O in its initial rotation state
-            occupied_cells.append((0, 0))  # (column_index, row_index)
-            occupied_cells.append((1, 0))
-            occupied_cells.append((0, 1))
-            occupied_cells.append((1, 1))
-        elif self.type == 'Z':
-            n = 3  # n = number of rows = number of columns in the tile matrix
-            # shape of the tetromino Z in its initial rotation state
-            occupied_cells.append((0, 1))  # (column_index, row_index)
-            occupied_cells.append((1, 1))
-            occupied_cells.append((1, 2))
-            occupied_cells.append((2, 2))
-        elif self.type == 'J':
-            n = 3  # n = number of rows = number of columns in the tile matrix
-            # shape of the tetromino Z in its initial orientation
-            occupied_cells.append((0, 0))
-            occupied_cells.append((2, 0))
-            occupied_cells.append((1, 0))
-            occupied_cells.append((2, 1))
-        elif self.type == 'L':
-            n = 3  # n = number of rows = number of columns in the tile matrix
-            # shape of the tetromino Z in its initial orientation
-            occupied_cells.append((0, 0))
-            occupied_cells.append((2, 0))
-            occupied_cells.append((1, 0))
-            occupied_cells.append((0, 1))
-        elif self.type == 'T':
-            n = 3  # n = number of rows = number of columns in the tile matrix
-            # shape of the tetromino Z in its initial orientation
-            occupied_cells.append((0, 0))
-            occupied_cells.append((2, 0))
-            occupied_cells.append((1, 0))
-            occupied_cells.append((1, 1))
-        elif self.type == 'S':
-            n = 3  # n = number of rows = number of columns in the tile matrix
-            # shape of the tetromino Z in its initial orientation
-            occupied_cells.append((0, 1))
-            occupied_cells.append((2, 0))
-            occupied_cells.append((1, 0))
-            occupied_cells.append((1, 1))
-        # create a matrix of numbered tiles based on the shape of this tetromino
-
-        self.tile_matrix = np.full((n, n), None)
-        # create the four tiles (minos) of this tetromino and place these tiles
-        # into the tile matrix
-        for i in range(len(occupied_cells)):
-            col_index, row_index = occupied_cells[i][0], occupied_cells[i][1]
-            # create a tile for each occupied cell of this tetromino
-            self.tile_matrix[row_index][col_index] = Tile()
-        # initialize the position of this tetromino (as the bottom left cell in
-        # the tile matrix) with a random horizontal position above the game grid
-        self.bottom_left_cell = Point()
-        self.bottom_left_cell.y = Tetromino.grid_height - 1
-        self.bottom_left_cell.x = random.randint(0, Tetromino.grid_width - n)
-
-    # A method that computes and returns the position of the cell in the tile
-    # matrix specified by the given row and column indexes
-    def get_cell_position(self, row, col):
-        n = len(self.tile_matrix)  # n = number of rows = number of columns
-        position = Point()
-        # horizontal position of the cell
-        position.x = self.bottom_left_cell.x + col
-        # vertical position of the cell
-        position.y = self.bottom_left_cell.y + (n - 1) - row
-        return position
-
-    # A method to return a copy of the tile matrix without any empty row/column,
-    # and the position of the bottom left cell when return_position is set
-    def get_min_bounded_tile_matrix(self, return_position=False):
-        n = len(self.tile_matrix)  # n = number of rows = number of columns
-        # determine rows and columns to copy (omit empty rows and columns)
-        min_row, max_row, min_col, max_col = n - 1, 0, n - 1, 0
-        for row in range(n):
-            for col in range(n):
-                if self.tile_matrix[row][col] is not None:
-                    if row < min_row:
-                        min_row = row
-                    if row > max_row:
-                        max_row = row
-                    if col < min_col:
-                        min_col = col
-                    if col > max_col:
-                        max_col = col
-        # copy the tiles from the tile matrix of this tetromino
-        copy = np.full((max_row - min_row + 1, max_col - min_col + 1), None)
-        for row in range(min_row, max_row + 1):
-            for col in range(min_col, max_col + 1):
-                if self.tile_matrix[row][col] is not None:
-                    row_ind = row - min_row
-                    col_ind = col - min_col
-                    copy[row_ind][col_ind] = cp.deepcopy(self.tile_matrix[row][col])
-        # return just the matrix copy when return_position is not set (as True)
-        # the argument return_position defaults to False when a value is not given
-        if not return_position:
-            return copy
-        # otherwise return the position of the bottom left cell in copy as well
-        else:
-            blc_position = cp.copy(self.bottom_left_cell)
-            blc_position.translate(min_col, (n - 1) - max_row)
-            return copy, blc_position
-
-    # A method for drawing the tetromino on the game grid
-    def draw(self):
-        n = len(self.tile_matrix)  # n = number of rows = number of columns
-        for row in range(n):
-            for col in range(n):
-                # draw each occupied cell as a tile on the game grid
-                if self.tile_matrix[row][col] is not None:
-                    # get the position of the tile
-                    position = self.get_cell_position(row, col)
-                    # draw only the tiles that are inside the game grid
-                    if position.y < Tetromino.grid_height:
-                        self.tile_matrix[row][col].draw(position)
+        # the initial rotation state of this tetromino (see ROTATIONS)
+        self.rotation = 0
+        self.orientation = ROTATIONS[shape][0]
+        # set a random number (2 or 4) for each of the four tiles (minos) of
+        # this tetromino (stored as exponents in the order of the occupied
+        # cells of each rotation state, so the numbers rotate with the cells)
+        if tile_exponents is None:
+            tile_exponents = [Tile.random_exponent()
+                              for _ in self.orientation.cells]
+        self.tile_exponents = tile_exponents
+        # the position of this tetromino (as the bottom left cell in the tile
+        # matrix)
+        self.bottom_left_cell = Point(x, y)
+
+    # A method for drawing the tetromino on the game grid with its bottom left
+    # cell at the given position (its current position by default), or its
+    # ghost (see Tile.draw) when ghost is set (only the tiles below the given
+    # grid height are drawn when it is given)
+    def draw(self, bottom_left_cell=None, ghost=False, grid_height=None):
+        if bottom_left_cell is None:
+            bottom_left_cell = self.bottom_left_cell
+        x, y = bottom_left_cell.x, bottom_left_cell.y
+        for (dx, dy), exponent in zip(self.orientation.offsets,
+                                      self.tile_exponents):
+            # draw only the tiles that are inside the game grid
+            if grid_height is None or y + dy < grid_height:
+                Tile.draw_exponent(exponent, x + dx, y + dy, ghost)
 
     # A method for moving this tetromino in a given direction by 1 on the grid
     def move(self, direction, game_grid):
@@ -154,92 +139,109 @@ class Tetromino:
             self.bottom_left_cell.y -= 1
         return True  # a successful move in the given direction
 
+    # A method for moving this tetromino down as far as it can go (hard drop)
     def hard_fall(self, game_grid):
-        while self.can_be_moved("down", game_grid):
-            self.move("down", game_grid)
+        self.bottom_left_cell.y -= game_grid.drop_distance(
+            self.orientation, self.bottom_left_cell.x, self.bottom_left_cell.y)
 
     def rotate(self, game_grid):
-        # Copy the current tile matrix before rotation
-        old_tile_matrix = np.copy(self.tile_matrix)
-        # Get the length of the tile matrix (assuming it's square)
-        n = len(self.tile_matrix)
-        # Perform the rotation in-place
-        for i in range(n // 2):
-            for j in range(i, n - i - 1):
-                temp = self.tile_matrix[i][j]
-                self.tile_matrix[i][j] = self.tile_matrix[n - 1 - j][i]
-                self.tile_matrix[n - 1 - j][i] = self.tile_matrix[n - 1 - i][n - 1 - j]
-                self.tile_matrix[n - 1 - i][n - 1 - j] = self.tile_matrix[j][n - 1 - i]
-                self.tile_matrix[j][n - 1 - i] = temp
+        # the next rotation state is looked up in the precomputed rotations
+        rotation = (self.rotation + 1) % 4
+        orientation = ROTATIONS[self.type][rotation]
         # Check if the rotated Tetromino is colliding with the game grid or other Tetrominoes
-        if not self.is_valid_position(game_grid):
-            # If the rotation results in an invalid position, revert to the old tile matrix
-            self.tile_matrix = old_tile_matrix
+        if not game_grid.can_place(orientation.row_masks, self.bottom_left_cell.x,
+                                   self.bottom_left_cell.y, inside=True):
+            return False  # the rotation results in an invalid position
+        self.rotation, self.orientation = rotation, orientation
+        return True
 
     def is_valid_position(self, game_grid):
-        # Check if the rotated Tetromino collides with the game grid or other Tetrominoes
-        for row in range(len(self.tile_matrix)):
-            for col in range(len(self.tile_matrix[0])):
-                if self.tile_matrix[row][col] is not None:
-                    # Get the position of the cell in the game grid
-                    position = self.get_cell_position(row, col)
-                    # Check if the position is within the bounds of the game grid
-                    if position.x < 0 or position.x >= Tetromino.grid_width or \
-                            position.y < 0 or position.y >= Tetromino.grid_height:
-                        return False
-                    # Check if the position is already occupied by another tile
-                    if game_grid.is_occupied(position.y, position.x):
-                        return False
-        return True
+        # Check if the Tetromino is inside the game grid and does not collide
+        # with the tiles on the game grid (by using the row bit masks)
+        return game_grid.can_place(self.orientation.row_masks, self.bottom_left_cell.x,
+                                   self.bottom_left_cell.y, inside=True)
 
     # A method for checking if this tetromino can be moved in a given direction
     def can_be_moved(self, direction, game_grid):
-        n = len(self.tile_matrix)  # n = number of rows = number of columns
-        # check for moving left or right
-        if direction == "left" or direction == "right":
-            for row_index in range(n):
-                for col_index in range(n):
-                    # direction = left --> check the leftmost tile of each row
-                    row, col = row_index, col_index
-                    if direction == "left" and self.tile_matrix[row][col] is not None:
-                        # the position of the leftmost tile of the current row
-                        leftmost = self.get_cell_position(row, col)
-                        # if any leftmost tile is at x = 0
-                        if leftmost.x == 0:
-                            return False  # this tetromino cannot be moved left
-                        # if the grid cell on the left of a leftmost tile is occupied
-                        if game_grid.is_occupied(leftmost.y, leftmost.x - 1):
-                            return False  # this tetromino cannot be moved left
-                        # as the leftmost tile of the current row is checked
-                        break  # end the inner for loop
-                    # direction = right --> check the rightmost tile of each row
-                    row, col = row_index, n - 1 - col_index
-                    if direction == "right" and self.tile_matrix[row][col] is not None:
-                        # the position of the rightmost tile of the current row
-                        rightmost = self.get_cell_position(row, col)
-                        # if any rightmost tile is at x = grid_width - 1
-                        if rightmost.x == Tetromino.grid_width - 1:
-                            return False  # this tetromino cannot be moved right
-                        # if the grid cell on the right of a rightmost tile is occupied
-                        if game_grid.is_occupied(rightmost.y, rightmost.x + 1):
-                            return False  # this tetromino cannot be moved right
-                        # as the rightmost tile of the current row is checked
-                        break  # end the inner for loop
-        # direction = down --> check the bottommost tile of each column
-        else:
-            for col in range(n):
-                for row in range(n - 1, -1, -1):
-                    # if the current cell of the tetromino is occupied by a tile
-                    if self.tile_matrix[row][col] is not None:
-                        # the position of the bottommost tile of the current col
-                        bottommost = self.get_cell_position(row, col)
-                        # if any bottommost tile is at y = 0
-                        if bottommost.y == 0:
-                            return False  # this tetromino cannot be moved down
-                        # if the grid cell below any bottommost tile is occupied
-                        if game_grid.is_occupied(bottommost.y - 1, bottommost.x):
-                            return False  # this tetromino cannot be moved down
-                        # as the bottommost tile of the current row is checked
-                        break  # end the inner for loop
-        # if this method does not end by returning False before this line
-        return True  # this tetromino can be moved in the given direction
+        x, y = self.bottom_left_cell.x, self.bottom_left_cell.y
+        # the position of this tetromino after the move in the given direction
+        # and the tiles on the side of this tetromino in this direction
+        if direction == "left":
+            x, masks = x - 1, self.orientation.left_masks
+        elif direction == "right":
+            x, masks = x + 1, self.orientation.right_masks
+        else:  # direction == "down"
+            y, masks = y - 1, self.orientation.bottom_masks
+        # this tetromino can be moved if none of these tiles leaves the game grid
+        # from the left, right or bottom side or overlaps a tile on the grid
+        return game_grid.can_place(masks, x, y)
+
+
+# A function for measuring the memory used by an object created by the given
+# function and the time taken for creating it (the results are printed with
+# the given name)
+def _measure(name, create, count=20000):
+    import time
+    import tracemalloc
+    objects = [None] * count
+    tracemalloc.start()
+    for i in range(count):
+        objects[i] = create()
+    size = tracemalloc.get_traced_memory()[0] / count
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for i in range(count):
+        create()
+    duration = (time.perf_counter() - start) / count
+    print("%-10s %6.1f bytes, created in %5.2f us" % (name, size, duration * 1e6))
+
+
+# A function for measuring the memory used by a point, a tile, a color and a
+# tetromino and the time taken for creating each of them, and the memory used
+# by the state of a game (the game grid with its tile matrix, row bitboards,
+# column heights, caches and the current and the next tetrominoes, and the
+# queue of the tetrominoes) and the time taken for copying it
+def _benchmark():
+    import copy
+    import random
+    import time
+    import tracemalloc
+    from lib.color import Color
+    from game_engine import GameEngine
+    random.seed(2048)
+    _measure("Point", lambda: Point(1, 2))
+    _measure("Tile", lambda: Tile(2))
+    _measure("Color", lambda: Color(1, 2, 3))
+    _measure("Tetromino", lambda: Tetromino("T", 0, 19))
+
+    # a game played with random actions for 200 time steps
+    def play(seed):
+        actions = random.Random(seed)
+        engine = GameEngine(20, 12, seed=seed)
+        for i in range(200):
+            engine.step(actions.choice(GameEngine.actions))
+            engine.tick()
+            if engine.game_over:
+                engine.restart()
+        return engine
+    play(0)  # the lookup tables are built before measuring
+    tracemalloc.start()
+    engines = [play(seed) for seed in range(100)]
+    state_size = tracemalloc.get_traced_memory()[0] / len(engines)
+    # the memory left when the queues of the tetrominoes are released
+    for engine in engines:
+        engine.pieces = None
+    grid_size = tracemalloc.get_traced_memory()[0] / len(engines)
+    tracemalloc.stop()
+    engines = [play(seed) for seed in range(100)]
+    start = time.perf_counter()
+    for engine in engines:
+        copy.deepcopy(engine)
+    duration = (time.perf_counter() - start) / len(engines)
+    print("game state %6.0f bytes, copied in %5.0f us" % (state_size,
+                                                         duration * 1e6))
+    print("game grid  %6.0f bytes" % grid_size)
+
+
+if __name__ == '__main__':
+    _benchmark()
@@ -1,4 +1,3 @@
-import lib.stddraw as stddraw  # used for drawing the tiles to display them
 from lib.color import Color  # used for coloring the tiles
 import random
 
@@ -9,8 +8,16 @@ class Tile:
     # ---------------------------------------------------------------------------
     # the value of the boundary thickness (for the boxes around the tiles)
     boundary_thickness = 0.004
+    # the value of the boundary thickness for the ghost tiles (the landing
+    # preview of the active tetromino drawn as the boxes of its tiles)
+    ghost_thickness = 0.008
     # font family and font size used for displaying the tile number
     font_family, font_size = "Arial", 14
+    # the pre-rendered pictures of the tiles keyed by (length, number), the
+    # lists of these pictures indexed by the exponents keyed by length (see
+    # get_sprites) and the canvas generation they are rendered for (see
+    # stddraw.canvasGeneration)
+    sprites, sprite_lists, sprites_generation = {}, {}, None
 
     # colors for numbers
     COLORS = {
@@ -60,54 +67,121 @@ class Tile:
         }
     }
 
-    # A constructor that creates a tile with 2 as the number on it
-    def __init__(self):
-        # set the number on this tile
-        random_numbers = [2, 4]
+    # the numbers on the tiles are stored in the cells of the game grid and the
+    # tetrominoes as exponents (number = 2 ** exponent, 0 for an empty cell)
+    # and the tiles are merged up to 2048 = 2 ** max_exponent
+    max_exponent = 11
+    # the color of the box (boundary) around the tiles
+    box_color = Color(170, 155, 144)
+
+    # a tile stores only its number in a slot (instead of a dictionary for
+    # each tile), and its colors are looked up in COLORS by its number
+    __slots__ = ("number",)
+
+    # A constructor that creates a tile with the given number on it (a random
+    # number of 2 or 4 when the number is not given)
+    def __init__(self, number=None):
+        if number is None:
+            number = 2 ** Tile.random_exponent()
         # set the number on the tile
-        self.number = random_numbers[random.randint(0, len(random_numbers) - 1)]
-        # set the colors of this tile
-        self.set_color()
-        self.box_color = Color(170, 155, 144)  # box (boundary) color
+        self.number = number
+
+    # A method that returns the exponent of a random number (2 or 4) for a new
+    # tile
+    @staticmethod
+    def random_exponent():
+        random_exponents = [1, 2]
+        return random_exponents[random.randint(0, len(random_exponents) - 1)]
 
-    def set_color(self):
-        self.background_color = self.COLORS[self.number]['background_color']
-        self.foreground_color = self.COLORS[self.number]['foreground_color']
+    # the background color of this tile (shared by the tiles with its number)
+    @property
+    def background_color(self):
+        return Tile.COLORS[self.number]['background_color']
+
+    # the foreground color of this tile (shared by the tiles with its number)
+    @property
+    def foreground_color(self):
+        return Tile.COLORS[self.number]['foreground_color']
 
     # A method for drawing this tile at a given position with a given length
-    def draw(self, position, length=1):  # length defaults to 1
+    # (only the box around the tile in its background color when ghost is set)
+    def draw(self, position, length=1, ghost=False):  # length defaults to 1
+        import lib.stddraw as stddraw  # used for drawing the tiles to display them
+        if ghost:
+            stddraw.setPenColor(self.background_color)
+            stddraw.setPenRadius(Tile.ghost_thickness)
+            stddraw.square(position.x, position.y, length / 2)
+            stddraw.setPenRadius()  # reset the pen radius to its default value
+            return
+        # draw the pre-rendered tile centered at the given position
+        stddraw.picture(Tile.get_sprite(self.number, length), position.x, position.y)
+
+    # A method for drawing the tile with the number 2 ** exponent and length 1
+    # centered at (x, y) as the draw method does, but without creating a tile
+    # (used for drawing the tetrominoes in each frame)
+    @staticmethod
+    def draw_exponent(exponent, x, y, ghost=False):
+        import lib.stddraw as stddraw  # used for drawing the tiles to display them
+        if ghost:
+            stddraw.setPenColor(Tile.COLORS[1 << exponent]["background_color"])
+            stddraw.setPenRadius(Tile.ghost_thickness)
+            stddraw.square(x, y, 0.5)
+            stddraw.setPenRadius()  # reset the pen radius to its default value
+            return
+        stddraw.picture(Tile.get_sprites()[exponent], x, y)
+
+    # A method that returns the pre-rendered picture of the tile with the given
+    # number and length
+    @staticmethod
+    def get_sprite(number, length=1):
+        import lib.stddraw as stddraw  # used for drawing the tiles to display them
+        # the tiles are pre-rendered again when the canvas size or scale changes
+        if Tile.sprites_generation != stddraw.canvasGeneration():
+            Tile.sprites, Tile.sprite_lists = {}, {}
+            Tile.sprites_generation = stddraw.canvasGeneration()
+        # pre-render the tiles with all the numbers with the given length once
+        if (length, number) not in Tile.sprites:
+            for tile_number in Tile.COLORS:
+                Tile.sprites[(length, tile_number)] = Tile(tile_number).render(length)
+        return Tile.sprites[(length, number)]
+
+    # A method that returns the list of the pre-rendered pictures of the tiles
+    # with the given length indexed by the exponents of their numbers (None for
+    # the exponent 0 of an empty cell, see stddraw.pictureGrid)
+    @staticmethod
+    def get_sprites(length=1):
+        import lib.stddraw as stddraw  # used for drawing the tiles to display them
+        # the list is created once for each length and canvas generation
+        if Tile.sprites_generation != stddraw.canvasGeneration() or \
+                length not in Tile.sprite_lists:
+            sprites = [None] + [Tile.get_sprite(2 ** exponent, length)
+                                for exponent in range(1, Tile.max_exponent + 1)]
+            Tile.sprite_lists[length] = sprites
+        return Tile.sprite_lists[length]
+
+    # A method for rendering this tile with a given length as a picture (drawn
+    # centered at the position of the tile by the draw method)
+    def render(self, length):
+        import lib.stddraw as stddraw  # used for drawing the tiles to display them
+        stddraw.beginLayer(-length / 2, -length / 2, length, length)
         # draw the tile as a filled square
         stddraw.setPenColor(self.background_color)
-        stddraw.filledSquare(position.x, position.y, length / 2)
+        stddraw.filledSquare(0, 0, length / 2)
         # draw the bounding box around the tile as a square
         stddraw.setPenColor(self.box_color)
         stddraw.setPenRadius(Tile.boundary_thickness)
-        stddraw.square(position.x, position.y, length / 2)
+        stddraw.square(0, 0, length / 2)
         stddraw.setPenRadius()  # reset the pen radius to its default value
         # draw the number on the tile
         stddraw.setPenColor(self.foreground_color)
         stddraw.setFontFamily(Tile.font_family)
         stddraw.setFontSize(Tile.font_size)
-        stddraw.text(position.x, position.y, str(self.number))
-
-    def if_matches(self, tile):
-        # if the number on the tile is equal to the number on the current tile
-        if self.number == tile.number and self.number < 2048:
-            # set the number on the current tile to the sum of the two numbers
-            self.number = self.number * 2
-            # increase the score by the value of the number on the current tile
-            # Remove the tile and update the color of the current tile
-            tile.number = None
-
-            # Update the color of the current tile
-            self.set_color()
-            # return True to indicate that the tiles were matched
-            return self.number
-        # return False to indicate that the tiles were not matched
-        else:
-            return 0
+        stddraw.text(0, 0, str(self.number))
+        return stddraw.endLayer()
 
-    # Merges tiles in the tile matrix.
+    # Merges tiles in the tile matrix (a matrix of exponents, see max_exponent).
+    # (The game uses the vectorized merge_engine.resolve_merges with the same
+    # rules, and this reference version is used for testing it.)
     def merge_tiles(tile_matrix, score):
         # iterate through the tile matrix
         for col in range(len(tile_matrix[0])):
@@ -116,30 +190,33 @@ class Tile:
                     # if the tile to the top of the current tile is not empty
                     # and the number on the current tile is equal to the number
                     # on the tile to the top merge them
-                    if tile_matrix[row][col] != None and tile_matrix[row + 1][col] != None and tile_matrix[row][
-                        col].number == tile_matrix[row + 1][col].number:
-                        score += tile_matrix[row][col].if_matches(tile_matrix[row + 1][col])
-                        tile_matrix[row + 1][col] = None
+                    if tile_matrix[row][col] != 0 and tile_matrix[row][col] == tile_matrix[row + 1][col]:
+                        # the number on the current tile is doubled (up to 2048)
+                        # and the score is increased by the doubled number
+                        if tile_matrix[row][col] < Tile.max_exponent:
+                            tile_matrix[row][col] += 1
+                            score += 2 ** int(tile_matrix[row][col])
+                        tile_matrix[row + 1][col] = 0
                         # After merging the tiles, move the tiles down
                         for row_index in range(row + 1, len(tile_matrix)):
-                            if tile_matrix[row_index][col] != None:
+                            if tile_matrix[row_index][col] != 0:
                                 tile_matrix[row_index - 1][col] = tile_matrix[row_index][col]
-                                tile_matrix[row_index][col] = None
+                                tile_matrix[row_index][col] = 0
                 except IndexError:
                     pass
                 # check neighboring tiles
-                right_neighbour = tile_matrix[row + 1][col] == None if row + 1 < len(tile_matrix) else True
-                up_neighbour = tile_matrix[row][col + 1] == None if col + 1 < len(tile_matrix[0]) else True
-                left_neighbour = tile_matrix[row - 1][col] == None if row - 1 >= 0 else True
-                down_neighbour = tile_matrix[row][col - 1] == None if col - 1 >= 0 else True
+                right_neighbour = tile_matrix[row + 1][col] == 0 if row + 1 < len(tile_matrix) else True
+                up_neighbour = tile_matrix[row][col + 1] == 0 if col + 1 < len(tile_matrix[0]) else True
+                left_neighbour = tile_matrix[row - 1][col] == 0 if row - 1 >= 0 else True
+                down_neighbour = tile_matrix[row][col - 1] == 0 if col - 1 >= 0 else True
                 # if the current tile is not empty and the neighbors are empty
                 # move the current tile to the any empty neighbor
                 # do not do in the first row
                 if row != 0:
                     if tile_matrix[row][
-                        col] != None and right_neighbour and left_neighbour and up_neighbour and down_neighbour:
+                        col] != 0 and right_neighbour and left_neighbour and up_neighbour and down_neighbour:
                         tile_matrix[row - 1][col] = tile_matrix[row][col]
-                        tile_matrix[row][col] = None
+                        tile_matrix[row][col] = 0
                         row -= 1
                 row += 1
         return score